@@ -0,0 +1,108 @@
+"""Measure how long neuromedia takes to get ready for watching news.
+
+Run from the repository root with the same environment as neuromedia.py:
+
+    python -m benchmarks.startup [--repeat 3] [--skip-telegram]
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from neuromedia import build_core
+from src.config import SESSION_NAME, api_hash, api_id, chats_to_follow
+from src.ml_client import JSON_SCHEMAS, NewsTags, RewrittenNews
+from src.scraper import Scraper
+from src.utils import run_async
+
+
+def _report(name: str, timings: list[float]):
+    print(
+        f"{name:<28} median {statistics.median(timings) * 1000:10.4f} ms"
+        f"  min {min(timings) * 1000:10.4f} ms  ({len(timings)} runs)"
+    )
+
+
+def bench_schemas(repeat: int, calls: int = 1000):
+    for name, lookup in (
+        ("schema per call", lambda model: model.model_json_schema()),
+        ("precomputed schema", JSON_SCHEMAS.__getitem__),
+    ):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            for _ in range(calls):
+                lookup(NewsTags)
+                lookup(RewrittenNews)
+            timings.append((time.perf_counter() - started) / calls)
+        _report(name, timings)
+
+
+def _close(core):
+    core.db.close()
+    core.ml_client.cache.close()
+
+
+async def _connect() -> Scraper:
+    scraper = Scraper(
+        chats=chats_to_follow,
+        api_id=api_id,
+        api_hash=api_hash,
+        session_name=SESSION_NAME,
+    )
+    await scraper.connect()
+    await scraper._client.stop()
+    return scraper
+
+
+async def _timed(coro) -> float:
+    started = time.perf_counter()
+    await coro
+    return time.perf_counter() - started
+
+
+async def bench_startup(repeat: int, telegram: bool):
+    print(f"event loop: {type(asyncio.get_running_loop()).__module__}")
+    core_timings, telegram_timings, total_timings = [], [], []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        core = await asyncio.to_thread(build_core)
+        core_timings.append(time.perf_counter() - started)
+        _close(core)
+
+        if not telegram:
+            continue
+        telegram_timings.append(await _timed(_connect()))
+
+        started = time.perf_counter()
+        core, _ = await asyncio.gather(asyncio.to_thread(build_core), _connect())
+        total_timings.append(time.perf_counter() - started)
+        _close(core)
+
+    _report("database and pipeline", core_timings)
+    if telegram:
+        _report("telegram connect", telegram_timings)
+        _report(
+            "sequential (sum)",
+            [db + tg for db, tg in zip(core_timings, telegram_timings)],
+        )
+        _report("concurrent", total_timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--skip-telegram",
+        action="store_true",
+        help="Only measure the database part, without connecting to Telegram",
+    )
+    args = parser.parse_args()
+
+    bench_schemas(args.repeat)
+    run_async(bench_startup(args.repeat, telegram=not args.skip_telegram))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import argparse
+from datetime import datetime, timedelta, timezone
+
+from src.archive import FORMATS, export_records, import_records, print_progress
+from src.config import DB_NAME, DB_PASSWORD, DB_USER, RETENTION_PERIOD
+from src.db import PostgreStorage
+
+
+def retention(storage: PostgreStorage, args):
+    older_than = (
+        timedelta(days=args.days) if args.days is not None else RETENTION_PERIOD
+    )
+    processed = storage.apply_retention(older_than, archive=not args.drop)
+    action = "Dropped" if args.drop else "Archived"
+    print(f"{action} {processed} {'partitions' if storage.partitioned else 'rows'}")
+
+
+def export(storage: PostgreStorage, args):
+    count = export_records(
+        storage, args.path, args.format, args.batch_size, progress=print_progress
+    )
+    print(f"\nExported {count} records to {args.path}")
+
+
+def import_(storage: PostgreStorage, args):
+    count = import_records(
+        storage, args.path, args.format, args.batch_size, progress=print_progress
+    )
+    print(f"\nImported {count} records from {args.path}")
+
+
+def partition(storage: PostgreStorage, args):
+    if storage.partitioned:
+        print("Table records is already partitioned")
+        return
+    moved = storage.partition_table(args.legacy_created_at)
+    print(f"Moved {moved} records, the old table is kept as records_legacy")
+
+
+def alias(storage: PostgreStorage, args):
+    storage.tags.add_alias(args.alias, args.canonical)
+    print(f"Tag {args.alias} now maps to {args.canonical}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Neuromedia maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    retention_parser = commands.add_parser(
+        "retention", help="Archive or drop records past the retention period"
+    )
+    retention_parser.add_argument(
+        "--days", type=int, help="Retention period in days, overrides the config"
+    )
+    retention_parser.add_argument(
+        "--drop", action="store_true", help="Drop old records instead of archiving"
+    )
+    retention_parser.set_defaults(handler=retention)
+
+    for name, handler, help in (
+        ("export", export, "Stream all records to a file"),
+        ("import", import_, "Stream records from a file, replacing same ids"),
+    ):
+        archive_parser = commands.add_parser(name, help=help)
+        archive_parser.add_argument("path")
+        archive_parser.add_argument("--format", choices=FORMATS, default="jsonl")
+        archive_parser.add_argument("--batch-size", type=int, default=10000)
+        archive_parser.set_defaults(handler=handler)
+
+    partition_parser = commands.add_parser(
+        "partition", help="Convert a table created before partitioning"
+    )
+    partition_parser.add_argument(
+        "--legacy-created-at",
+        type=lambda value: datetime.fromisoformat(value).astimezone(timezone.utc),
+        help="Creation time for records stored before it was tracked, "
+        "ISO format, defaults to the earliest known one",
+    )
+    partition_parser.set_defaults(handler=partition)
+
+    alias_parser = commands.add_parser(
+        "alias", help="Map a tag spelling to a canonical tag"
+    )
+    alias_parser.add_argument("alias")
+    alias_parser.add_argument("canonical")
+    alias_parser.set_defaults(handler=alias)
+
+    args = parser.parse_args()
+
+    storage = PostgreStorage(dbname=DB_NAME, user=DB_USER, password=DB_PASSWORD)
+    try:
+        args.handler(storage, args)
+    finally:
+        storage.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,59 @@
-from prometheus_client import start_http_server
-
-from src.config import DB_NAME, DB_PASSWORD, DB_USER, PROMETHEUS_PORT
+from src.cache import ResultCache
+from src.config import (CHECKPOINT_PATH, DB_NAME, DB_PASSWORD, DB_USER,
+                        FILTER_BLOCKED_PATTERNS, FILTER_CLASSIFIER_PATH,
+                        FILTER_CLASSIFIER_THRESHOLD, FILTER_MAX_EMOJI_RATIO,
+                        FILTER_MAX_LINK_RATIO, FILTER_MIN_LENGTH,
+                        LOOP_MONITOR_INTERVAL, LOOP_STALL_THRESHOLD,
+                        MAX_QUEUE_AGE, PROMETHEUS_PORT, RESULT_CACHE_MAX_BYTES,
+                        RESULT_CACHE_PATH, SOURCE_PRIORITIES,
+                        SOURCE_RATE_LIMITS, SOURCE_WEIGHTS)
 from src.core import Core
 from src.db import PostgreStorage
+from src.filters import ContentFilter, load_classifier
 from src.ml_client import MLClient
+from src.monitor import LoopMonitor, start_monitoring_server
+from src.scheduler import FairScheduler
 from src.scraper import get_scraper
 
-if __name__ == "__main__":
-    start_http_server(PROMETHEUS_PORT)
 
+def build_core() -> Core:
+    """Connect to the database and assemble the news processing pipeline"""
     storage = PostgreStorage(dbname=DB_NAME, user=DB_USER, password=DB_PASSWORD)
-    ml_client = MLClient(db=storage)
-    core = Core(db=storage, ml_client=ml_client)
-    scraper = get_scraper(core=core)
+    storage.create_partitions()
+    cache = ResultCache(RESULT_CACHE_PATH, max_bytes=RESULT_CACHE_MAX_BYTES)
+    ml_client = MLClient(db=storage, cache=cache)
+    scheduler = FairScheduler(
+        weights=SOURCE_WEIGHTS,
+        priorities=SOURCE_PRIORITIES,
+        rate_limits=SOURCE_RATE_LIMITS,
+        max_age=MAX_QUEUE_AGE,
+    )
+    content_filter = ContentFilter(
+        min_length=FILTER_MIN_LENGTH,
+        max_link_ratio=FILTER_MAX_LINK_RATIO,
+        max_emoji_ratio=FILTER_MAX_EMOJI_RATIO,
+        blocked_patterns=FILTER_BLOCKED_PATTERNS,
+        classifier=(
+            load_classifier(FILTER_CLASSIFIER_PATH) if FILTER_CLASSIFIER_PATH else None
+        ),
+        classifier_threshold=FILTER_CLASSIFIER_THRESHOLD,
+    )
+    return Core(
+        db=storage,
+        ml_client=ml_client,
+        scheduler=scheduler,
+        content_filter=content_filter,
+        checkpoint_path=CHECKPOINT_PATH,
+    )
+
+
+if __name__ == "__main__":
+    monitor = LoopMonitor(
+        interval=LOOP_MONITOR_INTERVAL, stall_threshold=LOOP_STALL_THRESHOLD
+    )
+    start_monitoring_server(PROMETHEUS_PORT, monitor)
+
+    scraper = get_scraper(core_factory=build_core, monitor=monitor)
+
+    scraper.core.db.close()
+    scraper.core.ml_client.cache.close()
@@ -0,0 +1,188 @@
+import asyncio
+import hashlib
+import json
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from aiohttp import web
+
+from src.config import (API_CACHE_TTL, API_MAX_PAGE_SIZE, API_PAGE_SIZE,
+                        API_POOL_SIZE, API_PORT, DB_NAME, DB_PASSWORD, DB_USER)
+from src.db import PostgreStorage
+from src.utils import get_logger
+
+logger = get_logger("API")
+
+
+class StoragePool:
+    """Fixed set of storage connections shared by all requests"""
+
+    def __init__(self, factory: Callable[[], Any], size: int):
+        self._factory = factory
+        self._size = size
+        self._idle: asyncio.Queue | None = None
+
+    async def start(self):
+        self._idle = asyncio.Queue()
+        for _ in range(self._size):
+            self._idle.put_nowait(await asyncio.to_thread(self._factory))
+        logger.info(f"Storage pool started with {self._size} connections")
+
+    async def run(self, method: str, *args, **kwargs):
+        """Call a storage method in a worker thread with a pooled connection"""
+        storage = await self._idle.get()
+        try:
+            return await asyncio.to_thread(getattr(storage, method), *args, **kwargs)
+        finally:
+            self._idle.put_nowait(storage)
+
+    async def close(self):
+        while not self._idle.empty():
+            self._idle.get_nowait().close()
+
+
+class ResponseCache:
+    """Short-lived cache of serialized responses shared by all readers"""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._entries: Dict[str, Tuple[float, str, bytes]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def get(self, key: str, load) -> Tuple[str, bytes]:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1], entry[2]
+
+        # Concurrent misses for the same key wait for a single query
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                return entry[1], entry[2]
+
+            body = json.dumps(await load(), ensure_ascii=False).encode("utf-8")
+            etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+            self._entries[key] = (time.monotonic() + self.ttl, etag, body)
+            self._evict_expired()
+            return etag, body
+
+    def _evict_expired(self):
+        now = time.monotonic()
+        for key in [key for key, entry in self._entries.items() if entry[0] <= now]:
+            del self._entries[key]
+            self._locks.pop(key, None)
+
+
+POOL = web.AppKey("pool", StoragePool)
+CACHE = web.AppKey("cache", ResponseCache)
+
+
+def _serialize(record) -> Dict[str, Any]:
+    created_at = record.get("created_at")
+    return {
+        "id": record["id"],
+        "text": record["text"],
+        "tags": record["tags"] or [],
+        "source": record.get("source"),
+        "created_at": (
+            created_at.isoformat() if isinstance(created_at, datetime) else created_at
+        ),
+    }
+
+
+def _int_param(request: web.Request, name: str) -> Optional[int]:
+    value = request.query.get(name)
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise web.HTTPBadRequest(text=f"Parameter {name} must be an integer")
+
+
+async def _respond(request: web.Request, load) -> web.Response:
+    etag, body = await request.app[CACHE].get(request.path_qs, load)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={int(request.app[CACHE].ttl)}",
+    }
+    if_none_match = request.headers.get("If-None-Match", "")
+    candidates = {
+        value.strip().removeprefix("W/") for value in if_none_match.split(",")
+    }
+    if etag in candidates or "*" in candidates:
+        return web.Response(status=304, headers=headers)
+    return web.Response(body=body, content_type="application/json", headers=headers)
+
+
+async def _page(request: web.Request, tag: Optional[str] = None) -> web.Response:
+    limit = _int_param(request, "limit") or API_PAGE_SIZE
+    limit = max(1, min(limit, API_MAX_PAGE_SIZE))
+    cursor = _int_param(request, "cursor")
+
+    async def load():
+        pool = request.app[POOL]
+        canonical = None if tag is None else await pool.run("lookup_tag", tag)
+        records = await pool.run("get_page", limit, before_id=cursor, tag=canonical)
+        items = [_serialize(record) for record in records]
+        next_cursor = items[-1]["id"] if len(items) == limit else None
+        return {"items": items, "next_cursor": next_cursor}
+
+    return await _respond(request, load)
+
+
+async def feed(request: web.Request) -> web.Response:
+    return await _page(request)
+
+
+async def by_tag(request: web.Request) -> web.Response:
+    return await _page(request, tag=request.match_info["tag"])
+
+
+async def by_id(request: web.Request) -> web.Response:
+    try:
+        record_id = int(request.match_info["id"])
+    except ValueError:
+        raise web.HTTPBadRequest(text="News id must be an integer")
+
+    async def load():
+        record = await request.app[POOL].run("get", record_id)
+        if record is None:
+            raise web.HTTPNotFound(text=f"News {record_id} not found")
+        return _serialize(record)
+
+    return await _respond(request, load)
+
+
+def create_app(
+    storage_factory: Callable[[], Any], pool_size: int = API_POOL_SIZE
+) -> web.Application:
+    app = web.Application()
+    app[POOL] = StoragePool(storage_factory, pool_size)
+    app[CACHE] = ResponseCache(API_CACHE_TTL)
+
+    async def on_startup(app):
+        await app[POOL].start()
+
+    async def on_cleanup(app):
+        await app[POOL].close()
+
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    app.router.add_get("/news", feed)
+    app.router.add_get("/news/tag/{tag}", by_tag)
+    app.router.add_get("/news/{id}", by_id)
+    return app
+
+
+if __name__ == "__main__":
+    web.run_app(
+        create_app(
+            lambda: PostgreStorage(
+                dbname=DB_NAME, user=DB_USER, password=DB_PASSWORD, autocommit=True
+            )
+        ),
+        port=API_PORT,
+    )
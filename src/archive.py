@@ -0,0 +1,179 @@
+import json
+import sys
+from datetime import datetime
+from typing import IO, Callable, Iterator, Optional
+
+from src.db import RECORD_COLUMNS, PostgreStorage
+from src.utils import get_logger
+
+logger = get_logger("Archive")
+
+FORMATS = ("jsonl", "csv", "parquet")
+
+ProgressCallback = Callable[[int], None]
+
+
+class ProgressFile:
+    """File wrapper reporting CSV lines passing through it during COPY.
+
+    Quoted texts may span several lines, so the reported count is an
+    upper bound of the number of records.
+    """
+
+    def __init__(self, file: IO, progress: Optional[ProgressCallback], every: int):
+        self.file = file
+        self.progress = progress
+        self.every = every
+        self.lines = -1  # header line
+
+    def _count(self, data):
+        lines_before = self.lines
+        self.lines += data.count("\n") if isinstance(data, str) else data.count(b"\n")
+        if (
+            self.progress
+            and self.lines > 0
+            and lines_before // self.every != self.lines // self.every
+        ):
+            self.progress(self.lines)
+
+    def write(self, data):
+        if isinstance(data, bytes):
+            data = data.decode("utf-8")
+        self.file.write(data)
+        self._count(data)
+
+    def read(self, size: int = -1):
+        data = self.file.read(size)
+        self._count(data)
+        return data
+
+    def readline(self, size: int = -1):
+        data = self.file.readline(size)
+        self._count(data)
+        return data
+
+
+def _report(progress: Optional[ProgressCallback], count: int, every: int):
+    if progress and count % every == 0:
+        progress(count)
+
+
+def _to_json(row: dict) -> str:
+    row = dict(row)
+    if isinstance(row.get("created_at"), datetime):
+        row["created_at"] = row["created_at"].isoformat()
+    return json.dumps(row, ensure_ascii=False)
+
+
+def export_records(
+    storage: PostgreStorage,
+    path: str,
+    fmt: str,
+    batch_size: int = 10000,
+    progress: Optional[ProgressCallback] = None,
+) -> int:
+    """Stream the whole archive to a file, returning the number of records"""
+    logger.info(f"Export records to {path} as {fmt}")
+
+    if fmt == "csv":
+        with open(path, "w", newline="", encoding="utf-8") as file:
+            count = storage.copy_to_csv(ProgressFile(file, progress, batch_size))
+    elif fmt == "jsonl":
+        count = 0
+        with open(path, "w", encoding="utf-8") as file:
+            for row in storage.iter_records(batch_size=batch_size):
+                file.write(_to_json(row) + "\n")
+                count += 1
+                _report(progress, count, batch_size)
+    elif fmt == "parquet":
+        count = _export_parquet(storage, path, batch_size, progress)
+    else:
+        raise ValueError(f"Unknown format {fmt}, expected one of {FORMATS}")
+
+    logger.info(f"Exported {count} records")
+    return count
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise RuntimeError("Parquet support requires the pyarrow package") from e
+    return pyarrow
+
+
+def _export_parquet(storage, path, batch_size, progress) -> int:
+    pa = _import_pyarrow()
+    schema = pa.schema(
+        [
+            ("id", pa.int64()),
+            ("text", pa.string()),
+            ("tags", pa.list_(pa.string())),
+            ("summary", pa.string()),
+            ("source", pa.string()),
+            ("created_at", pa.timestamp("us", tz="UTC")),
+        ]
+    )
+
+    count = 0
+    batch = []
+    with pa.parquet.ParquetWriter(path, schema) as writer:
+        for row in storage.iter_records(batch_size=batch_size):
+            batch.append(dict(row))
+            if len(batch) >= batch_size:
+                writer.write_batch(pa.RecordBatch.from_pylist(batch, schema=schema))
+                count += len(batch)
+                batch = []
+                _report(progress, count, batch_size)
+        if batch:
+            writer.write_batch(pa.RecordBatch.from_pylist(batch, schema=schema))
+            count += len(batch)
+    return count
+
+
+def _read_jsonl(file: IO) -> Iterator[dict]:
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def _read_parquet(path: str, batch_size: int) -> Iterator[dict]:
+    pa = _import_pyarrow()
+    for batch in pa.parquet.ParquetFile(path).iter_batches(batch_size=batch_size):
+        yield from batch.to_pylist()
+
+
+def _counting(
+    rows: Iterator[dict], progress: Optional[ProgressCallback], every: int
+) -> Iterator[dict]:
+    for count, row in enumerate(rows, start=1):
+        _report(progress, count, every)
+        yield {column: row.get(column) for column in RECORD_COLUMNS}
+
+
+def import_records(
+    storage: PostgreStorage,
+    path: str,
+    fmt: str,
+    batch_size: int = 10000,
+    progress: Optional[ProgressCallback] = None,
+) -> int:
+    """Stream records from a file into the archive, replacing records with same ids"""
+    logger.info(f"Import records from {path} as {fmt}")
+
+    if fmt == "csv":
+        with open(path, newline="", encoding="utf-8") as file:
+            return storage.copy_from_csv(ProgressFile(file, progress, batch_size))
+    if fmt == "jsonl":
+        with open(path, encoding="utf-8") as file:
+            rows = _counting(_read_jsonl(file), progress, batch_size)
+            return storage.import_rows(rows, batch_size=batch_size)
+    if fmt == "parquet":
+        rows = _counting(_read_parquet(path, batch_size), progress, batch_size)
+        return storage.import_rows(rows, batch_size=batch_size)
+    raise ValueError(f"Unknown format {fmt}, expected one of {FORMATS}")
+
+
+def print_progress(count: int):
+    print(f"\r{count} records", end="", file=sys.stderr, flush=True)
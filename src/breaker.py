@@ -0,0 +1,86 @@
+import asyncio
+import threading
+import time
+
+from prometheus_client import Counter, Gauge
+
+from src.utils import get_logger
+
+logger = get_logger("Breaker")
+
+breaker_state_gauge = Gauge(
+    "circuit_breaker_state",
+    "Circuit breaker state (0 - closed, 1 - half-open, 2 - open)",
+    ["name"],
+)
+breaker_opened_counter = Counter(
+    "circuit_breaker_opened_total", "Total number of circuit breaker trips", ["name"]
+)
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    HALF_OPEN = "half_open"
+    OPEN = "open"
+
+    _STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(
+        self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = 0.0
+        self._state = self.CLOSED
+        self._lock = threading.Lock()
+        breaker_state_gauge.labels(name).set(0)
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._refresh()
+            return self._state
+
+    def _set_state(self, state: str):
+        if state != self._state:
+            logger.warning(f"Circuit {self.name}: {self._state} -> {state}")
+        self._state = state
+        breaker_state_gauge.labels(self.name).set(self._STATE_VALUES[state])
+
+    def _refresh(self):
+        if (
+            self._state == self.OPEN
+            and time.monotonic() - self._opened_at >= self.reset_timeout
+        ):
+            self._set_state(self.HALF_OPEN)
+
+    def allow_request(self) -> bool:
+        """Closed and half-open circuits let calls through, open ones reject them"""
+        with self._lock:
+            self._refresh()
+            return self._state != self.OPEN
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._set_state(self.CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or (
+                self._state == self.CLOSED and self._failures >= self.failure_threshold
+            ):
+                self._opened_at = time.monotonic()
+                self._set_state(self.OPEN)
+                breaker_opened_counter.labels(self.name).inc()
+
+    async def wait_until_available(self, poll_interval: float = 1.0):
+        while not self.allow_request():
+            await asyncio.sleep(poll_interval)
@@ -0,0 +1,105 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from prometheus_client import Counter
+
+from src.utils import get_logger
+
+logger = get_logger("Cache")
+
+cache_hits_counter = Counter(
+    "result_cache_hits_total", "Total number of result cache hits", ["kind"]
+)
+cache_misses_counter = Counter(
+    "result_cache_misses_total", "Total number of result cache misses", ["kind"]
+)
+
+
+class ResultCache:
+    """Persistent key-value store for inference results with LRU eviction by size"""
+
+    def __init__(self, path: str, max_bytes: int):
+        logger.info(f"Result cache init at {path}")
+
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self._create_table()
+        self._size = self._total_size()
+
+    def _create_table(self):
+        with self._lock:
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS results(
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_used REAL NOT NULL
+                );
+            """
+            )
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS results_last_used ON results(last_used);"
+            )
+            self.conn.commit()
+
+    def _total_size(self) -> int:
+        with self._lock:
+            row = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM results;")
+            return row.fetchone()[0]
+
+    @staticmethod
+    def make_key(*parts) -> str:
+        payload = json.dumps(parts, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, kind: str, key: str) -> Optional[str]:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT value FROM results WHERE key = ?;", (key,)
+            ).fetchone()
+            if row is None:
+                cache_misses_counter.labels(kind).inc()
+                return None
+            self.conn.execute(
+                "UPDATE results SET last_used = ? WHERE key = ?;", (time.time(), key)
+            )
+            self.conn.commit()
+        cache_hits_counter.labels(kind).inc()
+        return row[0]
+
+    def set(self, key: str, value: str):
+        size = len(key) + len(value.encode("utf-8"))
+        with self._lock:
+            old = self.conn.execute(
+                "SELECT size FROM results WHERE key = ?;", (key,)
+            ).fetchone()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO results (key, value, size, last_used) VALUES (?, ?, ?, ?);",
+                (key, value, size, time.time()),
+            )
+            self._size += size - (old[0] if old else 0)
+            self._evict()
+            self.conn.commit()
+
+    def _evict(self):
+        while self._size > self.max_bytes:
+            row = self.conn.execute(
+                "SELECT key, size FROM results ORDER BY last_used LIMIT 1;"
+            ).fetchone()
+            if row is None:
+                self._size = 0
+                return
+            self.conn.execute("DELETE FROM results WHERE key = ?;", (row[0],))
+            self._size -= row[1]
+            logger.info(f"Evicted cached result {row[0]}")
+
+    def close(self):
+        logger.info("Close result cache")
+
+        self.conn.close()
@@ -1,4 +1,5 @@
 import os
+from datetime import timedelta
 
 from dotenv import load_dotenv
 
@@ -10,9 +11,86 @@ api_id = os.getenv("API_ID")
 api_hash = os.getenv("API_HASH")
 FETCH_INTERVAL = 5
 SESSION_NAME = "scraper"
+# Album parts and split posts within this many seconds become one news item
+COALESCE_WINDOW = 2.0
+COALESCE_MAX_MESSAGES = 10  # Telegram albums have at most 10 parts
+DEDUP_HISTORY = 1000
 
 DB_NAME = os.getenv("POSTGRES_DB")
 DB_USER = os.getenv("POSTGRES_USER")
 DB_PASSWORD = os.getenv("POSTGRES_PASSWORD")
+# Seconds before tag aliases are reloaded, picking up manage.py alias changes
+TAG_ALIASES_TTL = 300
+
+# Run the event loop on uvloop when it is installed
+USE_UVLOOP = os.getenv("USE_UVLOOP", "1") == "1"
 
 PROMETHEUS_PORT = 8000
+LOOP_MONITOR_INTERVAL = 0.5
+LOOP_STALL_THRESHOLD = 1.0
+
+# Read API for feed consumers
+API_PORT = 8080
+API_POOL_SIZE = 4
+API_CACHE_TTL = 5.0
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+
+# Streamlit dashboard
+FEED_PAGE_SIZE = 50
+RENDER_CACHE_SIZE = 10000
+TAGS_CACHE_TTL = 30
+
+# Logging configuration
+LOG_FILE = os.getenv("LOG_FILE", "run.log")
+LOG_ASYNC = os.getenv("LOG_ASYNC", "1") == "1"
+LOG_JSON = os.getenv("LOG_JSON", "0") == "1"
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+LOG_PAYLOAD_MAX_CHARS = int(os.getenv("LOG_PAYLOAD_MAX_CHARS", "200"))
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "1.0"))
+
+# Pre-LLM content filter
+FILTER_MIN_LENGTH = 20  # letters and digits outside links
+FILTER_MAX_LINK_RATIO = 0.5
+FILTER_MAX_EMOJI_RATIO = 0.3
+FILTER_BLOCKED_PATTERNS = [r"#реклама", r"#ad\b", r"\berid\b"]
+FILTER_CLASSIFIER_PATH = os.getenv("FILTER_CLASSIFIER_PATH")
+FILTER_CLASSIFIER_THRESHOLD = 0.5
+
+# LLM configuration
+LLM_MODEL = "gemma3:12b"
+CONTEXT_MAX_ITEMS = 10
+CONTEXT_CHAR_BUDGET = 4000
+SUMMARY_MAX_CHARS = 400
+CONTEXT_WINDOW = timedelta(hours=48)
+
+# Records older than this are archived by the retention job
+RETENTION_PERIOD = timedelta(days=365)
+# Monthly partitions created ahead by the backend startup and the retention job
+PARTITIONS_AHEAD = 2
+
+RESULT_CACHE_PATH = os.getenv("RESULT_CACHE_PATH", "ml_cache.sqlite3")
+RESULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+OLLAMA_HOST = os.getenv("OLLAMA_HOST")
+LLM_TIMEOUT = 120.0
+LLM_MAX_RETRIES = 3
+LLM_BACKOFF_BASE = 1.0
+LLM_BACKOFF_MAX = 30.0
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_RESET_TIMEOUT = 30.0
+
+# Scheduling between Core and the ML client, keyed by source chat title
+SOURCE_WEIGHTS = {}
+SOURCE_PRIORITIES = {}
+SOURCE_RATE_LIMITS = {}  # news per minute
+MAX_QUEUE_AGE = 15 * 60
+MAX_IN_FLIGHT = 2
+
+# Number of LLM pipelines running at once
+ML_MAX_CONCURRENCY = 2
+# On SIGTERM, in-flight news get this many seconds to finish before they are
+# written to the checkpoint and resubmitted on the next start
+DRAIN_TIMEOUT = 60.0
+CHECKPOINT_PATH = os.getenv("CHECKPOINT_PATH", "pending_news.jsonl")
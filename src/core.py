@@ -1,7 +1,13 @@
 import asyncio
+import json
+import os
 
 from prometheus_client import Counter
 
+from src.config import MAX_IN_FLIGHT
+from src.filters import ContentFilter
+from src.scheduler import FairScheduler
+from src.supervisor import TaskSupervisor
 from src.utils import get_logger
 
 logger = get_logger("Core")
@@ -14,57 +20,154 @@ successful_news_counter = Counter(
 
 
 class Core:
-    def __init__(self, db, ml_client):
+    def __init__(
+        self,
+        db,
+        ml_client,
+        scheduler: FairScheduler | None = None,
+        content_filter: ContentFilter | None = None,
+        max_in_flight: int = MAX_IN_FLIGHT,
+        checkpoint_path: str | None = None,
+    ):
         logger.info("Core init")
 
         self.db = db
         self.ml_client = ml_client
+        self.scheduler = scheduler
+        self.content_filter = content_filter
+        self.checkpoint_path = checkpoint_path
         self.pending_tasks = {}
+        self.supervisor = TaskSupervisor("core")
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._dispatcher = None
 
     async def receive_news(self, text: str, source: str):
-        logger.info(f"Received from scraper. {source}: {text}")
+        logger.info(
+            f"Received from scraper. {source}",
+            extra={"source": source, "payload": text},
+        )
 
         reviewed_news_counter.inc()
 
-        await self.send_to_ml(text, source)
-
-    async def send_to_ml(self, text: str, source: str):
+        if not self.supervisor.accepting:
+            self._write_checkpoint([{"text": text, "source": source}])
+            return
+
+        if self.content_filter is not None:
+            reason = self.content_filter.check(text)
+            if reason is not None:
+                logger.info(f"Filtered news from {source}: {reason}")
+                return
+
+        if self.scheduler is None:
+            await self.send_to_ml(text, source)
+            return
+
+        self.scheduler.put(text, source)
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch_loop())
+
+    async def _dispatch_loop(self):
+        """Feed scheduled news to ML, keeping at most max_in_flight in progress"""
+        while True:
+            await self._slots.acquire()
+            item = await self.scheduler.get()
+            try:
+                result_task = await self.send_to_ml(item.text, item.source)
+            except asyncio.CancelledError:
+                # Keep the item for drain to checkpoint
+                self.scheduler.put(item.text, item.source)
+                raise
+            except Exception as e:
+                logger.error(f"Failed to submit news from {item.source}: {e}")
+                self._slots.release()
+                continue
+            result_task.add_done_callback(lambda _: self._slots.release())
+
+    async def send_to_ml(self, text: str, source: str) -> asyncio.Task:
         message = {"text": text, "source": source}
 
+        # Hold the backlog here instead of dropping it while the model is down
+        await self.ml_client.wait_until_available()
         news_id = await self.ml_client.submit(text, source)
         self.pending_tasks[news_id] = message
         logger.info(f"Submitted to ML, got ID: {news_id}")
 
-        asyncio.create_task(self.poll_ml_status(news_id))
-
-    async def poll_ml_status(
-        self, news_id: str, max_attempts: int = 120, delay: float = 5.0
-    ):
+        return self.supervisor.spawn(
+            self.wait_ml_result(news_id), name=f"result-{news_id}"
+        )
+
+    async def drain(self, timeout: float):
+        """Stop taking news, let in-flight news finish and checkpoint the rest"""
+        logger.info(f"Draining with {len(self.pending_tasks)} news in flight")
+
+        self.supervisor.close()
+        leftovers = []
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            await asyncio.gather(self._dispatcher, return_exceptions=True)
+        if self.scheduler is not None:
+            leftovers += [
+                {"text": item.text, "source": item.source}
+                for item in self.scheduler.pop_all()
+            ]
+
+        await self.supervisor.wait(timeout)
+        leftovers += list(self.pending_tasks.values())
+        await self.supervisor.cancel_all()
+        await self.ml_client.shutdown()
+
+        self._write_checkpoint(leftovers)
+        logger.info(f"Drained, {len(leftovers)} news left for the next start")
+
+    def _write_checkpoint(self, messages: list[dict]):
+        if not messages:
+            return
+        if self.checkpoint_path is None:
+            logger.warning(f"No checkpoint configured, {len(messages)} news lost")
+            return
+
+        with open(self.checkpoint_path, "a", encoding="utf-8") as file:
+            for message in messages:
+                file.write(json.dumps(message, ensure_ascii=False) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+
+    async def resume(self):
+        """Resubmit news checkpointed by the previous drain"""
+        if self.checkpoint_path is None or not os.path.exists(self.checkpoint_path):
+            return
+
+        with open(self.checkpoint_path, encoding="utf-8") as file:
+            messages = [json.loads(line) for line in file if line.strip()]
+        os.remove(self.checkpoint_path)
+
+        logger.info(f"Resuming {len(messages)} checkpointed news")
+        for message in messages:
+            await self.receive_news(message["text"], message["source"])
+
+    async def wait_ml_result(self, news_id: str):
+        """Store the news once ML is done with it.
+
+        There is no deadline: slow generations, retries and open circuits
+        only delay the result, and drain checkpoints news still in flight.
+        """
         try:
-            for attempt in range(max_attempts):
-                logger.info(f"Pulling news {news_id}, attempt №{attempt}")
-
-                status = await self.ml_client.get_status(news_id)
-
-                if status["state"] == "processing":
-                    await asyncio.sleep(1)
-                elif status["state"] == "drop":
-                    logger.info(f"News {news_id} dropped.")
-                    del self.pending_tasks[news_id]
-                    dropped_news_counter.inc()
-                    return
-                elif status["state"] == "ok":
-                    rewritten = status["rewritten_text"]
-                    tags = status["tags"]
-                    self.db.store(news_id, rewritten, tags)
-                    logger.info(f"Stored to DB: {news_id}")
-                    del self.pending_tasks[news_id]
-                    successful_news_counter.inc()
-                    return
-
-            logger.warning(f"News {news_id} timed out after {max_attempts} attempts.")
-            del self.pending_tasks[news_id]
+            status = await self.ml_client.wait_result(news_id)
+
+            if status["state"] == "ok":
+                rewritten = status["rewritten_text"]
+                tags = status["tags"]
+                source = self.pending_tasks[news_id]["source"]
+                self.db.store(news_id, rewritten, tags, source=source)
+                logger.info(f"Stored to DB: {news_id}")
+                del self.pending_tasks[news_id]
+                successful_news_counter.inc()
+            else:
+                logger.info(f"News {news_id} dropped ({status['state']}).")
+                del self.pending_tasks[news_id]
+                dropped_news_counter.inc()
         except asyncio.CancelledError:
-            logger.warning(f"Polling for {news_id} was cancelled.")
+            logger.warning(f"Waiting for {news_id} was cancelled.")
             self.pending_tasks.pop(news_id, None)
             raise
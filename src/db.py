@@ -1,15 +1,52 @@
-from typing import List, Optional, Tuple
+from datetime import datetime, timedelta, timezone
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Tuple
 
 import psycopg2
-from psycopg2.extras import RealDictCursor
+import psycopg2.errors
+from psycopg2.extras import RealDictCursor, execute_values
 
-from src.utils import get_logger
+from src.config import PARTITIONS_AHEAD, SUMMARY_MAX_CHARS
+from src.tags import TagCanonicalizer
+from src.utils import get_logger, summarize
 
 logger = get_logger("DB")
 
+RECORD_COLUMNS = ("id", "text", "tags", "summary", "source", "created_at")
+
+# Columns added after the first release, created on older tables
+ADDED_COLUMNS = {
+    "summary": "TEXT",
+    "source": "TEXT",
+    "created_at": "TIMESTAMPTZ",
+}
+# Set after adding the column, so existing rows keep NULL instead of being
+# stamped with the time of the migration
+ADDED_DEFAULTS = {"created_at": "now()"}
+RECORDS_TABLE = """
+    CREATE TABLE IF NOT EXISTS {name}(
+        id INTEGER NOT NULL,
+        text TEXT NOT NULL,
+        tags TEXT[],
+        summary TEXT,
+        source TEXT,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        PRIMARY KEY (id, created_at)
+    ) PARTITION BY RANGE (created_at);
+"""
+RECORD_INDEXES = {
+    "records_created_at_idx": "(created_at)",
+    "records_tags_idx": "USING GIN (tags)",
+}
+
+# Advisory lock serializing writes by id, as the primary key of a
+# partitioned table has to include created_at and cannot keep ids unique
+RECORDS_LOCK = 0x7265636F
+
 
 class PostgreStorage:
-    def __init__(self, dbname, user, password, host="localhost", port=5433):
+    def __init__(
+        self, dbname, user, password, host="localhost", port=5433, autocommit=False
+    ):
         logger.info("DB init")
 
         self.conn = psycopg2.connect(
@@ -20,35 +57,275 @@ class PostgreStorage:
             port=port,
             cursor_factory=RealDictCursor,
         )
+        self._partitions = set()
         self._create_table()
+        # Read-only users would otherwise stay idle in a transaction after the
+        # first query, blocking schema changes and retention
+        self.conn.autocommit = autocommit
+        self.tags = TagCanonicalizer(store=self)
 
     def _create_table(self):
         logger.info("Create table records")
 
         with self.conn.cursor() as cur:
+            cur.execute(RECORDS_TABLE.format(name="records"))
+            # ALTER and CREATE INDEX lock the table even when there is nothing
+            # to do, which would wait for every open reader, so only run
+            # the migrations that are missing
             cur.execute(
                 """
-                CREATE TABLE IF NOT EXISTS records(
-                    id INTEGER PRIMARY KEY,
-                    text TEXT NOT NULL,
-                    tags TEXT[]
+                SELECT column_name FROM information_schema.columns
+                WHERE table_schema = current_schema() AND table_name = 'records';
+            """
+            )
+            columns = {row["column_name"] for row in cur.fetchall()}
+            # Tables created before partitioning keep working with new columns
+            for column, definition in ADDED_COLUMNS.items():
+                if column not in columns:
+                    logger.info(f"Add column {column} to records")
+                    cur.execute(
+                        f"ALTER TABLE records ADD COLUMN {column} {definition};"
+                    )
+                    if column in ADDED_DEFAULTS:
+                        cur.execute(
+                            f"ALTER TABLE records ALTER COLUMN {column} "
+                            f"SET DEFAULT {ADDED_DEFAULTS[column]};"
+                        )
+
+            cur.execute(
+                """
+                SELECT indexname FROM pg_indexes
+                WHERE schemaname = current_schema() AND tablename = 'records';
+            """
+            )
+            indexes = {row["indexname"] for row in cur.fetchall()}
+            for index, definition in RECORD_INDEXES.items():
+                if index not in indexes:
+                    logger.info(f"Create index {index}")
+                    cur.execute(
+                        f"CREATE INDEX IF NOT EXISTS {index} ON records {definition};"
+                    )
+            cur.execute(
+                """
+                SELECT EXISTS (
+                    SELECT 1 FROM pg_partitioned_table
+                    WHERE partrelid = 'records'::regclass
+                ) AS partitioned;
+            """
+            )
+            self.partitioned = cur.fetchone()["partitioned"]
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS tag_aliases(
+                    alias TEXT PRIMARY KEY,
+                    canonical TEXT NOT NULL
                 );
             """
             )
             self.conn.commit()
 
-    def store(self, record_id: str, text: str, tags: Optional[List[str]] = None):
+        if not self.partitioned:
+            logger.warning(
+                "Table records is not partitioned, retention deletes rows, "
+                "run manage.py partition to convert it"
+            )
+
+    @staticmethod
+    def _partition_name(month: datetime) -> str:
+        return f"records_{month:%Y_%m}"
+
+    @staticmethod
+    def _month_start(moment: datetime) -> datetime:
+        return moment.astimezone(timezone.utc).replace(
+            day=1, hour=0, minute=0, second=0, microsecond=0
+        )
+
+    @staticmethod
+    def _next_month(month: datetime) -> datetime:
+        return (month + timedelta(days=32)).replace(day=1)
+
+    def create_partitions(
+        self, months_ahead: int = PARTITIONS_AHEAD, since: Optional[datetime] = None
+    ) -> List[str]:
+        """Create missing monthly partitions from since (this month by default)
+        up to months_ahead months from now, returning the created ones.
+
+        Creating a partition waits for every open transaction on records and
+        blocks readers queued behind it, so partitions are made ahead of time
+        at startup and by the retention job, never when storing.
+        """
+        if not self.partitioned:
+            return []
+
+        now = datetime.now(timezone.utc)
+        month = self._month_start(since or now)
+        last = self._month_start(now)
+        for _ in range(months_ahead):
+            last = self._next_month(last)
+
+        created = []
+        while month <= last:
+            if self._ensure_partition(month):
+                created.append(self._partition_name(month))
+            month = self._next_month(month)
+        if created:
+            logger.info(f"Created partitions {created}")
+        return created
+
+    def _ensure_partition(self, created_at: datetime) -> bool:
+        """Create the monthly partition holding created_at if it is missing"""
+        start = self._month_start(created_at)
+        name = self._partition_name(start)
+        if not self.partitioned or name in self._partitions:
+            return False
+
+        created = False
+        with self.conn.cursor() as cur:
+            # Checking first avoids taking the lock when the partition exists
+            cur.execute("SELECT to_regclass(%s) IS NOT NULL AS present;", (name,))
+            if not cur.fetchone()["present"]:
+                cur.execute(
+                    f"""
+                    CREATE TABLE IF NOT EXISTS {name} PARTITION OF records
+                    FOR VALUES FROM (%s) TO (%s);
+                """,
+                    (start, self._next_month(start)),
+                )
+                created = True
+            self.conn.commit()
+            self._ensure_unique_ids(cur, name)
+        self._partitions.add(name)
+        return created
+
+    def partition_table(self, legacy_created_at: Optional[datetime] = None) -> int:
+        """Convert a table created before partitioning, returning moved rows.
+
+        Rows are copied into a new partitioned table which then takes the name
+        records, the old table is kept as records_legacy. Rows stored before
+        created_at existed get legacy_created_at, by default the earliest
+        known created_at.
+        """
+        if self.partitioned:
+            return 0
+        logger.info("Partition table records")
+
+        columns = ", ".join(RECORD_COLUMNS)
+        with self.conn.cursor() as cur:
+            # Readers keep working until the swap, writers wait for it
+            cur.execute("LOCK TABLE records IN EXCLUSIVE MODE;")
+            cur.execute(
+                "SELECT min(created_at) AS first, max(created_at) AS last FROM records;"
+            )
+            bounds = cur.fetchone()
+            now = datetime.now(timezone.utc)
+            legacy_created_at = legacy_created_at or bounds["first"] or now
+            cur.execute(
+                "UPDATE records SET created_at = %s WHERE created_at IS NULL;",
+                (legacy_created_at,),
+            )
+
+            cur.execute(RECORDS_TABLE.format(name="records_partitioned"))
+            month = self._month_start(min(legacy_created_at, bounds["first"] or now))
+            last = self._month_start(max(now, bounds["last"] or now))
+            for _ in range(PARTITIONS_AHEAD):
+                last = self._next_month(last)
+            while month <= last:
+                name = self._partition_name(month)
+                cur.execute(
+                    f"""
+                    CREATE TABLE {name} PARTITION OF records_partitioned
+                    FOR VALUES FROM (%s) TO (%s);
+                """,
+                    (month, self._next_month(month)),
+                )
+                cur.execute(f"CREATE UNIQUE INDEX {name}_id_key ON {name} (id);")
+                month = self._next_month(month)
+            cur.execute(
+                f"""
+                INSERT INTO records_partitioned ({columns})
+                SELECT {columns} FROM records;
+            """
+            )
+            moved = cur.rowcount
+
+            # Free the index names for the new table
+            cur.execute(
+                """
+                SELECT indexname FROM pg_indexes
+                WHERE schemaname = current_schema() AND tablename = 'records'
+                AND indexname LIKE 'records%%';
+            """
+            )
+            for row in cur.fetchall():
+                legacy = row["indexname"].replace("records", "records_legacy", 1)
+                cur.execute(f"ALTER INDEX {row['indexname']} RENAME TO {legacy};")
+            cur.execute("ALTER TABLE records RENAME TO records_legacy;")
+            cur.execute("ALTER TABLE records_partitioned RENAME TO records;")
+            cur.execute("ALTER INDEX records_partitioned_pkey RENAME TO records_pkey;")
+            for index, definition in RECORD_INDEXES.items():
+                cur.execute(f"CREATE INDEX {index} ON records {definition};")
+            self.conn.commit()
+
+        self.partitioned = True
+        self._partitions.clear()
+        logger.info(f"Moved {moved} records into the partitioned table")
+        return moved
+
+    def _ensure_unique_ids(self, cur, partition: str):
+        """Keep ids unique within the partition, at least"""
+        index = f"{partition}_id_key"
+        cur.execute("SELECT to_regclass(%s) IS NOT NULL AS present;", (index,))
+        if cur.fetchone()["present"]:
+            return
+        try:
+            cur.execute(
+                f"CREATE UNIQUE INDEX IF NOT EXISTS {index} ON {partition} (id);"
+            )
+            self.conn.commit()
+        except psycopg2.errors.UniqueViolation as e:
+            self.conn.rollback()
+            logger.warning(f"Partition {partition} has duplicate ids: {e}")
+
+    def _lock_id(self, cur, record_id):
+        cur.execute(
+            "SELECT pg_advisory_xact_lock_shared(%s), pg_advisory_xact_lock(%s, %s);",
+            (RECORDS_LOCK, RECORDS_LOCK, record_id),
+        )
+
+    def store(
+        self,
+        record_id: str,
+        text: str,
+        tags: Optional[List[str]] = None,
+        source: Optional[str] = None,
+        created_at: Optional[datetime] = None,
+    ):
         logger.info("Store {record_id}")
 
+        created_at = created_at or datetime.now(timezone.utc)
+        if tags is not None:
+            tags = self.tags.canonicalize_all(tags)
+        summary = summarize(text, SUMMARY_MAX_CHARS)
+
+        # The partition key is part of the primary key, so upsert by id by hand
         with self.conn.cursor() as cur:
+            self._lock_id(cur, record_id)
             cur.execute(
                 """
-                INSERT INTO records (id, text, tags)
-                VALUES (%s, %s, %s)
-                ON CONFLICT (id) DO UPDATE SET text = EXCLUDED.text, tags = EXCLUDED.tags;
+                UPDATE records
+                SET text = %s, tags = %s, summary = %s, source = COALESCE(%s, source)
+                WHERE id = %s;
             """,
-                (record_id, text, tags),
+                (text, tags, summary, source, record_id),
             )
+            if cur.rowcount == 0:
+                cur.execute(
+                    """
+                    INSERT INTO records (id, text, tags, summary, source, created_at)
+                    VALUES (%s, %s, %s, %s, %s, %s);
+                """,
+                    (record_id, text, tags, summary, source, created_at),
+                )
             self.conn.commit()
 
     def get(self, record_id: str) -> Optional[Tuple[str, str, List[str]]]:
@@ -56,7 +333,11 @@ class PostgreStorage:
 
         with self.conn.cursor() as cur:
             cur.execute(
-                "SELECT id, text, tags FROM records WHERE id = %s;", (record_id,)
+                """
+                SELECT id, text, tags, source, created_at FROM records WHERE id = %s
+                ORDER BY created_at DESC LIMIT 1;
+            """,
+                (record_id,),
             )
             return cur.fetchone()
 
@@ -72,22 +353,224 @@ class PostgreStorage:
             return max_id
         return 0
 
-    def get_by_tag(self, tag: str):
+    def get_by_tag(self, tag: str, window: Optional[timedelta] = None):
+        """Get records with the tag, optionally only those created within window"""
         logger.info("Get by tag {tag}")
 
+        query = "SELECT id, text, tags, summary FROM records WHERE tags @> ARRAY[%s]"
+        params = [tag]
+        if window is not None:
+            query += " AND created_at >= now() - %s"
+            params.append(window)
+
+        with self.conn.cursor() as cur:
+            cur.execute(query + " ORDER BY id;", params)
+            return cur.fetchall()
+
+    def get_tag_aliases(self) -> Dict[str, str]:
+        logger.info("Get tag aliases")
+
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT alias, canonical FROM tag_aliases;")
+            return {row["alias"]: row["canonical"] for row in cur.fetchall()}
+
+    def get_tag_alias(self, alias: str) -> Optional[str]:
+        """Get the canonical tag of a normalized alias, if it is registered"""
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT canonical FROM tag_aliases WHERE alias = %s;", (alias,))
+            row = cur.fetchone()
+            return row["canonical"] if row is not None else None
+
+    def store_tag_alias(self, alias: str, canonical: str, replace: bool = False) -> str:
+        """Register an alias and return the canonical tag it ends up mapped to"""
+        logger.info(f"Store tag alias {alias} -> {canonical}")
+
+        on_conflict = (
+            "canonical = EXCLUDED.canonical" if replace else "alias = EXCLUDED.alias"
+        )
         with self.conn.cursor() as cur:
             cur.execute(
-                "SELECT id, text, tags FROM records WHERE %s = ANY(tags);", (tag,)
+                f"""
+                INSERT INTO tag_aliases (alias, canonical) VALUES (%s, %s)
+                ON CONFLICT (alias) DO UPDATE SET {on_conflict}
+                RETURNING canonical;
+            """,
+                (alias, canonical),
             )
+            canonical = cur.fetchone()["canonical"]
+            self.conn.commit()
+            return canonical
+
+    def lookup_tag(self, tag: str) -> str:
+        return self.tags.lookup(tag)
+
+    def get_page(
+        self,
+        limit: int,
+        before_id: Optional[int] = None,
+        tag: Optional[str] = None,
+        any_tags: Optional[List[str]] = None,
+    ):
+        """Get up to limit newest records with id below before_id.
+
+        tag keeps records having that tag, any_tags those having at least
+        one of the given tags.
+        """
+        logger.info(f"Get page before {before_id}, tag {tag}, any of {any_tags}")
+
+        query = "SELECT id, text, tags, source, created_at FROM records WHERE TRUE"
+        params = []
+        if before_id is not None:
+            query += " AND id < %s"
+            params.append(before_id)
+        if tag is not None:
+            query += " AND tags @> ARRAY[%s]"
+            params.append(tag)
+        if any_tags:
+            query += " AND tags && %s::TEXT[]"
+            params.append(list(any_tags))
+
+        with self.conn.cursor() as cur:
+            cur.execute(query + " ORDER BY id DESC LIMIT %s;", params + [limit])
             return cur.fetchall()
 
+    def get_tags(self) -> List[str]:
+        """Get all distinct tags of stored records in alphabetical order"""
+        logger.info("Get distinct tags")
+
+        with self.conn.cursor() as cur:
+            cur.execute(
+                "SELECT DISTINCT unnest(tags) AS tag FROM records ORDER BY tag;"
+            )
+            return [row["tag"] for row in cur.fetchall()]
+
     def get_all(self):
         logger.info("Get all records")
 
         with self.conn.cursor() as cur:
-            cur.execute("SELECT id, text, tags FROM records ORDER BY id DESC;")
+            cur.execute(
+                "SELECT id, text, tags, source, created_at FROM records ORDER BY id DESC;"
+            )
             return cur.fetchall()
 
+    def iter_records(self, batch_size: int = 1000) -> Iterator[dict]:
+        """Stream all records through a server-side cursor"""
+        logger.info("Stream all records")
+
+        columns = ", ".join(RECORD_COLUMNS)
+        with self.conn.cursor(name="records_export") as cur:
+            cur.itersize = batch_size
+            cur.execute(f"SELECT {columns} FROM records ORDER BY id;")
+            yield from cur
+        self.conn.commit()
+
+    def copy_to_csv(self, file: IO) -> int:
+        """Write all records to file as CSV with a header using COPY"""
+        logger.info("Copy records to CSV")
+
+        columns = ", ".join(RECORD_COLUMNS)
+        with self.conn.cursor() as cur:
+            cur.copy_expert(
+                f"COPY (SELECT {columns} FROM records ORDER BY id) TO STDOUT WITH CSV HEADER",
+                file,
+            )
+            copied = cur.rowcount
+        self.conn.commit()
+        return copied
+
+    def copy_from_csv(self, file: IO):
+        """Upsert records from a CSV file produced by copy_to_csv"""
+        logger.info("Copy records from CSV")
+
+        try:
+            self._create_staging()
+            with self.conn.cursor() as cur:
+                cur.copy_expert(
+                    f"COPY records_import ({', '.join(RECORD_COLUMNS)}) FROM STDIN WITH CSV HEADER",
+                    file,
+                )
+            return self._merge_staging()
+        except Exception:
+            self.conn.rollback()
+            raise
+
+    def import_rows(self, rows: Iterable[dict], batch_size: int = 1000) -> int:
+        """Upsert records from an iterable of dicts, batch by batch"""
+        logger.info("Import records")
+
+        try:
+            self._create_staging()
+            self._stage_rows(rows, batch_size)
+            return self._merge_staging()
+        except Exception:
+            self.conn.rollback()
+            raise
+
+    def _stage_rows(self, rows: Iterable[dict], batch_size: int):
+        batch = []
+        with self.conn.cursor() as cur:
+            for row in rows:
+                if not row.get("summary"):
+                    row["summary"] = summarize(row["text"], SUMMARY_MAX_CHARS)
+                if not row.get("created_at"):
+                    row["created_at"] = datetime.now(timezone.utc)
+                batch.append(tuple(row.get(column) for column in RECORD_COLUMNS))
+                if len(batch) >= batch_size:
+                    self._insert_staging(cur, batch)
+                    batch = []
+            if batch:
+                self._insert_staging(cur, batch)
+
+    @staticmethod
+    def _insert_staging(cur, batch: List[tuple]):
+        execute_values(
+            cur,
+            f"INSERT INTO records_import ({', '.join(RECORD_COLUMNS)}) VALUES %s",
+            batch,
+        )
+
+    def _create_staging(self):
+        with self.conn.cursor() as cur:
+            cur.execute("DROP TABLE IF EXISTS records_import;")
+            cur.execute(
+                "CREATE TEMPORARY TABLE records_import (LIKE records INCLUDING DEFAULTS);"
+            )
+
+    def _merge_staging(self) -> int:
+        """Move imported records from the staging table, replacing same ids"""
+        with self.conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT DISTINCT to_char(created_at AT TIME ZONE 'UTC', 'YYYY-MM') AS month
+                FROM records_import;
+            """
+            )
+            months = [row["month"] for row in cur.fetchall()]
+        # Imports run from manage.py, where waiting for the lock is fine
+        for month in months:
+            start = datetime.strptime(month, "%Y-%m").replace(tzinfo=timezone.utc)
+            self._ensure_partition(start)
+
+        columns = ", ".join(RECORD_COLUMNS)
+        with self.conn.cursor() as cur:
+            # Block store() for the whole merge instead of locking every id
+            cur.execute("SELECT pg_advisory_xact_lock(%s);", (RECORDS_LOCK,))
+            cur.execute(
+                "DELETE FROM records WHERE id IN (SELECT id FROM records_import);"
+            )
+            cur.execute(
+                f"""
+                INSERT INTO records ({columns})
+                SELECT DISTINCT ON (id) {columns} FROM records_import
+                ORDER BY id, created_at DESC;
+            """
+            )
+            imported = cur.rowcount
+            cur.execute("DROP TABLE records_import;")
+            self.conn.commit()
+        logger.info(f"Imported {imported} records")
+        return imported
+
     def delete(self, record_id: str):
         logger.info("Delete {record_id}")
 
@@ -95,6 +578,72 @@ class PostgreStorage:
             cur.execute("DELETE FROM records WHERE id = %s;", (record_id,))
             self.conn.commit()
 
+    def apply_retention(self, older_than: timedelta, archive: bool = True) -> int:
+        """Archive or drop records older than the retention period.
+
+        Partitions entirely past the cutoff are detached and kept as standalone
+        tables when archiving, or dropped otherwise. Unpartitioned tables move
+        old rows into records_archive instead. Returns the number of partitions
+        or rows processed.
+        """
+        cutoff = datetime.now(timezone.utc) - older_than
+        logger.info(f"Apply retention before {cutoff}")
+
+        with self.conn.cursor() as cur:
+            if not self.partitioned:
+                if archive:
+                    cur.execute(
+                        "CREATE TABLE IF NOT EXISTS records_archive (LIKE records);"
+                    )
+                    cur.execute(
+                        """
+                        WITH moved AS (
+                            DELETE FROM records WHERE created_at < %s RETURNING *
+                        )
+                        INSERT INTO records_archive SELECT * FROM moved;
+                    """,
+                        (cutoff,),
+                    )
+                else:
+                    cur.execute("DELETE FROM records WHERE created_at < %s;", (cutoff,))
+                processed = cur.rowcount
+                self.conn.commit()
+                return processed
+
+            cur.execute(
+                """
+                SELECT child.relname AS name
+                FROM pg_inherits
+                JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+                WHERE pg_inherits.inhparent = 'records'::regclass;
+            """
+            )
+            partitions = [row["name"] for row in cur.fetchall()]
+
+            processed = 0
+            for name in sorted(partitions):
+                try:
+                    start = datetime.strptime(name, "records_%Y_%m")
+                except ValueError:
+                    continue
+                start = start.replace(tzinfo=timezone.utc)
+                end = (start + timedelta(days=32)).replace(day=1)
+                if end > cutoff:
+                    continue
+
+                if archive:
+                    cur.execute(f"ALTER TABLE records DETACH PARTITION {name};")
+                    cur.execute(f"ALTER TABLE {name} RENAME TO archived_{name};")
+                else:
+                    cur.execute(f"DROP TABLE {name};")
+                self._partitions.discard(name)
+                processed += 1
+                logger.info(f"Retention processed partition {name}")
+            self.conn.commit()
+
+        self.create_partitions()
+        return processed
+
     def close(self):
         logger.info("Close connection to PostgreSQL")
 
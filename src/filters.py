@@ -0,0 +1,96 @@
+import re
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from prometheus_client import Counter
+
+from src.utils import get_logger
+
+logger = get_logger("Filter")
+
+filtered_news_counter = Counter(
+    "filtered_news_total", "Total number of news rejected before inference", ["reason"]
+)
+
+URL_PATTERN = re.compile(r"(https?://|www\.|t\.me/)\S+", re.IGNORECASE)
+EMOJI_PATTERN = re.compile(
+    "[\U0001f000-\U0001faff\u2600-\u27bf\u2b00-\u2bff\ufe0f\u200d]"
+)
+
+Predicate = Callable[[str], bool]
+
+
+def link_ratio(text: str) -> float:
+    """Share of non-space characters that belong to links"""
+    total = len("".join(text.split()))
+    if total == 0:
+        return 0.0
+    return sum(len(match.group()) for match in URL_PATTERN.finditer(text)) / total
+
+
+def emoji_ratio(text: str) -> float:
+    """Share of non-space characters that are emoji"""
+    total = len("".join(text.split()))
+    if total == 0:
+        return 0.0
+    return len(EMOJI_PATTERN.findall(text)) / total
+
+
+def load_classifier(path: str) -> Callable[[str], float]:
+    """Load a pickled scikit-learn text pipeline scoring how likely a text is news"""
+    try:
+        import joblib
+    except ImportError as e:
+        raise RuntimeError("Content classifier requires the joblib package") from e
+
+    model = joblib.load(path)
+    logger.info(f"Loaded content classifier from {path}")
+    return lambda text: float(model.predict_proba([text])[0][1])
+
+
+class ContentFilter:
+    """Cheap checks rejecting messages that are not worth an LLM call.
+
+    Rules are checked in order and the first matching one gives the reject
+    reason. Extra rules can be registered with add_rule.
+    """
+
+    def __init__(
+        self,
+        min_length: int = 0,
+        max_link_ratio: float = 1.0,
+        max_emoji_ratio: float = 1.0,
+        blocked_patterns: Iterable[str] = (),
+        classifier: Optional[Callable[[str], float]] = None,
+        classifier_threshold: float = 0.5,
+    ):
+        self.rules: List[Tuple[str, Predicate]] = []
+
+        words = re.compile(r"\w")
+        self.add_rule(
+            "too_short",
+            lambda text: len(words.findall(URL_PATTERN.sub("", text))) < min_length,
+        )
+        self.add_rule("links", lambda text: link_ratio(text) > max_link_ratio)
+        self.add_rule("emoji", lambda text: emoji_ratio(text) > max_emoji_ratio)
+
+        blocked = [re.compile(pattern, re.IGNORECASE) for pattern in blocked_patterns]
+        if blocked:
+            self.add_rule(
+                "blocked_pattern",
+                lambda text: any(pattern.search(text) for pattern in blocked),
+            )
+        if classifier is not None:
+            self.add_rule(
+                "classifier", lambda text: classifier(text) < classifier_threshold
+            )
+
+    def add_rule(self, reason: str, predicate: Predicate):
+        self.rules.append((reason, predicate))
+
+    def check(self, text: str) -> Optional[str]:
+        """Return the reason to reject the text, or None if it should be processed"""
+        for reason, predicate in self.rules:
+            if predicate(text):
+                filtered_news_counter.labels(reason).inc()
+                return reason
+        return None
@@ -1,14 +1,89 @@
 import asyncio
+import random
 import threading
+import time
 from typing import Any, Dict
 
-from ollama import chat
-from pydantic import BaseModel, Field
-
-from src.utils import get_logger
+import httpx
+from ollama import Client, ResponseError
+from prometheus_client import Counter, Histogram
+from pydantic import BaseModel, Field, ValidationError
+
+from src.breaker import CircuitBreaker, CircuitOpenError
+from src.cache import ResultCache
+from src.config import (BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT,
+                        CONTEXT_CHAR_BUDGET, CONTEXT_MAX_ITEMS, CONTEXT_WINDOW,
+                        LLM_BACKOFF_BASE, LLM_BACKOFF_MAX, LLM_MAX_RETRIES,
+                        LLM_MODEL, LLM_TIMEOUT, ML_MAX_CONCURRENCY,
+                        OLLAMA_HOST, SUMMARY_MAX_CHARS)
+from src.supervisor import TaskSupervisor
+from src.utils import get_logger, summarize
 
 logger = get_logger("ML CLient")
 
+# Bump whenever the prompt templates change so cached results are not reused
+PROMPT_VERSION = 2
+
+prompt_chars_histogram = Histogram(
+    "llm_prompt_chars",
+    "Length of prompts sent to the LLM in characters",
+    ["call"],
+    buckets=(250, 500, 1000, 2000, 4000, 8000, 16000, 32000),
+)
+prompt_eval_seconds_histogram = Histogram(
+    "llm_prompt_eval_seconds",
+    "Time the LLM server spent evaluating the prompt",
+    ["call"],
+)
+llm_retries_counter = Counter(
+    "llm_retries_total", "Total number of retried LLM calls", ["call", "reason"]
+)
+
+LLM_ERRORS = (ResponseError, httpx.HTTPError, ConnectionError)
+
+
+def is_transient(error: Exception) -> bool:
+    """Whether a failed call may succeed when retried.
+
+    Connection errors, timeouts and server errors are transient, client
+    errors such as an unknown model or a bad request are not.
+    """
+    if isinstance(error, ResponseError):
+        return error.status_code >= 500
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500
+    return isinstance(error, (httpx.TransportError, ConnectionError))
+
+
+def run_in_daemon_thread(func, *args) -> asyncio.Future:
+    """Run a blocking call in a daemon thread and return a future of its result.
+
+    A blocking chat call cannot be interrupted. Unlike asyncio.to_thread,
+    the process does not wait for the thread at exit, so a cancelled call
+    is simply abandoned and the drain timeout stays a real deadline.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def resolve(set_outcome, outcome):
+        if not future.done():
+            set_outcome(outcome)
+
+    def target():
+        try:
+            result = func(*args)
+        except BaseException as e:
+            outcome = (future.set_exception, e)
+        else:
+            outcome = (future.set_result, result)
+        try:
+            loop.call_soon_threadsafe(resolve, *outcome)
+        except RuntimeError:
+            pass  # The loop is closed, nobody waits for the result anymore
+
+    threading.Thread(target=target, name="llm-call", daemon=True).start()
+    return future
+
 
 class NewsTags(BaseModel):
     tags: list[str] = Field(description="List of most important entities in text")
@@ -22,11 +97,24 @@ class RewrittenNews(BaseModel):
     )
 
 
+# Generated once, pydantic rebuilds the schema on every model_json_schema() call
+JSON_SCHEMAS = {model: model.model_json_schema() for model in (NewsTags, RewrittenNews)}
+
+
 class MLClient:
-    def __init__(self, db):
+    def __init__(self, db, cache: ResultCache | None = None):
         self.db = db
-        self.llm = "gemma3:12b"
+        self.cache = cache
+        self.tags = db.tags
+        self.llm = LLM_MODEL
+        self._ollama = Client(host=OLLAMA_HOST, timeout=LLM_TIMEOUT)
+        self.breaker = CircuitBreaker(
+            "ollama",
+            failure_threshold=BREAKER_FAILURE_THRESHOLD,
+            reset_timeout=BREAKER_RESET_TIMEOUT,
+        )
         self.tasks = {}
+        self.supervisor = TaskSupervisor("ml", max_concurrency=ML_MAX_CONCURRENCY)
         max_id = self.db.get_max_id()
         self._counter = max_id + 1  # Start from max_id + 1
         self._lock = threading.Lock()
@@ -45,14 +133,23 @@ class MLClient:
             "state": "processing",
             "rewritten_text": None,
             "tags": [],
+            "done": asyncio.Event(),
         }
-        logger.info(f"Received update. Id = {task_id}, text = {text}")
+        logger.info(
+            f"Received update. Id = {task_id}",
+            extra={"news_id": task_id, "source": source, "payload": text},
+        )
 
-        asyncio.create_task(self._process_task(task_id))
+        self.supervisor.spawn(self._process_task(task_id), name=f"process-{task_id}")
 
         return task_id
 
     def _get_tags(self, text: str) -> list[str]:
+        key = ResultCache.make_key(self.llm, PROMPT_VERSION, "tags", text)
+        cached = self._cache_get("tags", key)
+        if cached is not None:
+            return NewsTags.model_validate_json(cached).tags
+
         template = f"""
 Extract 3-5 key entities from the following news text.
 Return only a JSON object with the required format.
@@ -62,26 +159,26 @@ News text:
 
 Extracted tags MUST be in English language.
 """
-        response = chat(
-            messages=[{"role": "user", "content": template}],
-            model=self.llm,
-            format=NewsTags.model_json_schema(),
-        )
-        tags = NewsTags.model_validate_json(response.message.content)
+        tags = self._chat("tags", template, NewsTags)
+        self._cache_set(key, tags.model_dump_json())
         return tags.tags
 
     def _rewrite_text(self, text: str, context_news: list[dict]) -> RewrittenNews:
+        context_ids = [news.get("id") for news in context_news]
+        key = ResultCache.make_key(
+            self.llm, PROMPT_VERSION, "rewrite", text, context_ids
+        )
+        cached = self._cache_get("rewrite", key)
+        if cached is not None:
+            return RewrittenNews.model_validate_json(cached)
+
+        # Static instructions go first so consecutive prompts share a prefix
+        # the server can reuse from its prompt cache.
         context_str = "\n\n".join([news.get("text", "") for news in context_news])
         template = f"""
-Rewrite the following news text to be more concise, using the context news below to avoid duplication.
+Rewrite the news text given at the end to be more concise, using the context news to avoid duplication.
 If the news is essentially the same as any of the context news, mark it as duplicate.
 
-Context news:
-{context_str}
-
-Original text:
-{text}
-
 Instructions:
 - Rewrite the text to be more concise and clear
 - Avoid duplicating information already present in context news
@@ -90,13 +187,112 @@ Instructions:
 - Rewritten text MUST be traslated to English language
 
 Return only a JSON object with the required format.
+
+Context news:
+{context_str}
+
+Original text:
+{text}
 """
-        response = chat(
-            messages=[{"role": "user", "content": template}],
-            model=self.llm,
-            format=RewrittenNews.model_json_schema(),
-        )
-        return RewrittenNews.model_validate_json(response.message.content)
+        rewritten = self._chat("rewrite", template, RewrittenNews)
+        self._cache_set(key, rewritten.model_dump_json())
+        return rewritten
+
+    def _cache_get(self, kind: str, key: str) -> str | None:
+        if self.cache is None:
+            return None
+        return self.cache.get(kind, key)
+
+    def _cache_set(self, key: str, value: str):
+        if self.cache is not None:
+            self.cache.set(key, value)
+
+    def _chat(self, call: str, template: str, schema: type[BaseModel]):
+        """Query the LLM with retries and return the response parsed into schema"""
+        prompt_chars_histogram.labels(call).observe(len(template))
+        messages = [{"role": "user", "content": template}]
+
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            if not self.breaker.allow_request():
+                raise CircuitOpenError(f"Circuit {self.breaker.name} is open")
+
+            try:
+                response = self._ollama.chat(
+                    messages=messages,
+                    model=self.llm,
+                    format=JSON_SCHEMAS[schema],
+                )
+            except LLM_ERRORS as e:
+                if not is_transient(e):
+                    raise
+                self.breaker.record_failure()
+                if attempt == LLM_MAX_RETRIES:
+                    raise
+                llm_retries_counter.labels(call, "error").inc()
+                logger.warning(f"LLM call {call} failed, retrying: {e}")
+                time.sleep(self._backoff(attempt))
+                continue
+
+            self.breaker.record_success()
+            if response.prompt_eval_duration:
+                prompt_eval_seconds_histogram.labels(call).observe(
+                    response.prompt_eval_duration / 1e9
+                )
+
+            try:
+                return schema.model_validate_json(response.message.content)
+            except ValidationError as e:
+                if attempt == LLM_MAX_RETRIES:
+                    raise
+                llm_retries_counter.labels(call, "validation").inc()
+                logger.warning(f"LLM call {call} returned invalid JSON, repairing")
+                messages = [
+                    {"role": "user", "content": template},
+                    {"role": "assistant", "content": response.message.content},
+                    {
+                        "role": "user",
+                        "content": f"Your answer does not match the required format: {e}\n"
+                        "Return only a JSON object with the required format.",
+                    },
+                ]
+
+    @staticmethod
+    def _backoff(attempt: int) -> float:
+        delay = min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2**attempt)
+        return random.uniform(delay / 2, delay)
+
+    async def wait_until_available(self):
+        """Block while the model server is considered down"""
+        await self.breaker.wait_until_available()
+
+    def _select_context(self, news_by_tag: list[list[dict]]) -> list[dict]:
+        """Rank context news by shared tags and fit them into the prompt budget"""
+        hits = {}
+        unique_news = {}
+        for tag_news in news_by_tag:
+            for news in tag_news:
+                hits[news["id"]] = hits.get(news["id"], 0) + 1
+                unique_news[news["id"]] = news
+
+        ranked = sorted(
+            unique_news.values(),
+            key=lambda x: (hits[x["id"]], x["id"]),
+            reverse=True,
+        )[:CONTEXT_MAX_ITEMS]
+
+        selected = []
+        budget = CONTEXT_CHAR_BUDGET
+        for news in ranked:
+            context_text = news.get("summary") or summarize(
+                news.get("text", ""), SUMMARY_MAX_CHARS
+            )
+            if len(context_text) > budget:
+                continue
+            budget -= len(context_text)
+            selected.append({"id": news["id"], "text": context_text})
+
+        # Oldest first keeps the prompt layout stable between similar requests
+        return sorted(selected, key=lambda x: x["id"])
 
     async def _process_task(self, task_id: int):
         """Process the task and update its status"""
@@ -104,21 +300,24 @@ Return only a JSON object with the required format.
         text = task["text"]
 
         try:
-            tags = self._get_tags(text)
+            tags = await self._run_llm(self._get_tags, text)
+            tags = self.tags.canonicalize_all(tags)
             logger.info(f"Generated tags. Id = {task_id}, tags = {tags}")
 
-            all_news = list(
-                dict(news) for tag in tags for news in self.db.get_by_tag(tag)
-            )
-            unique_news_dict = {}
-            for news in all_news:
-                unique_news_dict[news["id"]] = news
-            unique_news = list(unique_news_dict.values())
-            similar_news = sorted(unique_news, key=lambda x: x["id"])[-10:]
+            news_by_tag = [
+                [dict(news) for news in self.db.get_by_tag(tag, window=CONTEXT_WINDOW)]
+                for tag in tags
+            ]
+            similar_news = self._select_context(news_by_tag)
 
-            rewritten_news = self._rewrite_text(text, similar_news)
+            rewritten_news = await self._run_llm(self._rewrite_text, text, similar_news)
             logger.info(
-                f"Text rewritten. Id = {task_id}, new_text = {rewritten_news.rewritten_text}, is_duplicate = {rewritten_news.is_duplicate}, comment = {rewritten_news.comment}"
+                f"Text rewritten. Id = {task_id}, is_duplicate = {rewritten_news.is_duplicate}",
+                extra={
+                    "news_id": task_id,
+                    "payload": rewritten_news.rewritten_text,
+                    "comment": rewritten_news.comment,
+                },
             )
 
             self.tasks[task_id]["rewritten_text"] = rewritten_news.rewritten_text
@@ -133,6 +332,32 @@ Return only a JSON object with the required format.
             logger.error(f"Error processing task {task_id}: {e}")
 
         logger.info(f"Finished processing task {task_id}")
+        task["done"].set()
+
+    async def _run_llm(self, func, *args):
+        """Run a blocking LLM call off the event loop, waiting out open circuits"""
+        while True:
+            try:
+                return await run_in_daemon_thread(func, *args)
+            except CircuitOpenError:
+                logger.warning("Model server unavailable, waiting for recovery")
+                await self.wait_until_available()
+
+    async def shutdown(self):
+        """Abandon unfinished tasks, Core checkpoints their news.
+
+        LLM calls already sent keep running in their daemon threads until
+        the process exits, without delaying the exit.
+        """
+        self.supervisor.close()
+        await self.supervisor.cancel_all()
+
+    async def wait_result(self, task_id: int) -> Dict[str, Any]:
+        """Wait however long processing takes and return the final status"""
+        task = self.tasks.get(task_id)
+        if task is not None:
+            await task["done"].wait()
+        return await self.get_status(task_id)
 
     async def get_status(self, task_id: int) -> Dict[str, Any]:
         """Get the current status of a task"""
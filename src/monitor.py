@@ -0,0 +1,153 @@
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections import Counter as StackCounter
+from socketserver import ThreadingMixIn
+from typing import Optional
+from urllib.parse import parse_qs
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from prometheus_client import Counter, Histogram, make_wsgi_app
+
+from src.utils import get_logger
+
+logger = get_logger("Monitor")
+
+loop_lag_histogram = Histogram(
+    "event_loop_lag_seconds",
+    "Delay between the scheduled and actual wake up of the monitor task",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+loop_stalls_counter = Counter(
+    "event_loop_stalls_total", "Total number of detected event loop stalls"
+)
+
+MAX_PROFILE_SECONDS = 60
+
+
+class LoopMonitor:
+    """Measure event loop scheduling lag and report callbacks blocking it.
+
+    A task inside the loop sleeps for interval and records how late it woke
+    up. A watchdog thread notices when the task has not run for longer than
+    stall_threshold and logs the stack the loop thread is stuck in.
+    """
+
+    def __init__(self, interval: float = 0.5, stall_threshold: float = 1.0):
+        self.interval = interval
+        self.stall_threshold = stall_threshold
+        self.loop_thread_id: Optional[int] = None
+        self._heartbeat = time.monotonic()
+        self._task: Optional[asyncio.Task] = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        """Start monitoring the running event loop"""
+        self.loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.get_running_loop().create_task(self._measure())
+        threading.Thread(
+            target=self._watchdog, name="loop-watchdog", daemon=True
+        ).start()
+        logger.info("Event loop monitor started")
+
+    def stop(self):
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+
+    async def _measure(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - started - self.interval)
+            loop_lag_histogram.observe(lag)
+            self._heartbeat = time.monotonic()
+
+    def _watchdog(self):
+        reported = False
+        while not self._stopped.wait(self.stall_threshold / 2):
+            blocked_for = time.monotonic() - self._heartbeat - self.interval
+            if blocked_for < self.stall_threshold:
+                reported = False
+                continue
+            if reported:
+                continue
+
+            reported = True
+            loop_stalls_counter.inc()
+            frame = sys._current_frames().get(self.loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame else "unknown"
+            logger.warning(
+                f"Event loop blocked for {blocked_for:.2f}s",
+                extra={"stack": stack},
+            )
+
+    def profile(self, seconds: float, sample_interval: float = 0.005) -> str:
+        """Sample the loop thread stack and return it in folded flame graph format"""
+        samples = StackCounter()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            frame = sys._current_frames().get(self.loop_thread_id)
+            if frame is not None:
+                stack = traceback.extract_stack(frame)
+                samples[
+                    ";".join(f"{f.name} ({f.filename}:{f.lineno})" for f in stack)
+                ] += 1
+            time.sleep(sample_interval)
+
+        return "".join(f"{stack} {count}\n" for stack, count in samples.most_common())
+
+
+def make_monitoring_app(monitor: Optional[LoopMonitor]):
+    """WSGI app serving Prometheus metrics and the on-demand profiler"""
+    metrics_app = make_wsgi_app()
+
+    def app(environ, start_response):
+        if environ.get("PATH_INFO") != "/debug/profile":
+            return metrics_app(environ, start_response)
+
+        if monitor is None or monitor.loop_thread_id is None:
+            start_response("503 Service Unavailable", [("Content-Type", "text/plain")])
+            return [b"Event loop monitor is not running\n"]
+
+        query = parse_qs(environ.get("QUERY_STRING", ""))
+        try:
+            seconds = float(query.get("seconds", ["5"])[0])
+        except ValueError:
+            start_response("400 Bad Request", [("Content-Type", "text/plain")])
+            return [b"Parameter seconds must be a number\n"]
+
+        seconds = min(max(seconds, 0.1), MAX_PROFILE_SECONDS)
+        body = monitor.profile(seconds).encode("utf-8")
+        start_response("200 OK", [("Content-Type", "text/plain; charset=utf-8")])
+        return [body]
+
+    return app
+
+
+class _ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class _SilentHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def start_monitoring_server(port: int, monitor: Optional[LoopMonitor] = None):
+    """Serve /metrics and /debug/profile from a background thread"""
+    server = make_server(
+        "",
+        port,
+        make_monitoring_app(monitor),
+        server_class=_ThreadingWSGIServer,
+        handler_class=_SilentHandler,
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.info(f"Monitoring server started on port {port}")
+    return server
@@ -0,0 +1,149 @@
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional
+
+from prometheus_client import Counter, Gauge
+
+from src.utils import get_logger
+
+logger = get_logger("Scheduler")
+
+queued_news_gauge = Gauge(
+    "scheduler_queued_news", "Number of news waiting for inference", ["source"]
+)
+shed_news_counter = Counter(
+    "scheduler_shed_news_total",
+    "Total number of news dropped for waiting too long",
+    ["source"],
+)
+
+
+@dataclass
+class ScheduledItem:
+    text: str
+    source: str
+    finish_tag: float
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class FairScheduler:
+    """Weighted fair queue of news between Core and the ML client.
+
+    Sources with a higher priority are always served first. Within one
+    priority level every item gets a virtual finish tag of 1 / weight past
+    the previous item of its source, so a burst from one chat cannot delay
+    the other chats by more than its fair share.
+    """
+
+    def __init__(
+        self,
+        weights: Optional[Dict[str, float]] = None,
+        priorities: Optional[Dict[str, int]] = None,
+        rate_limits: Optional[Dict[str, float]] = None,
+        max_age: Optional[float] = None,
+    ):
+        self.weights = weights or {}
+        self.priorities = priorities or {}
+        self.rate_limits = rate_limits or {}  # items per minute
+        self.max_age = max_age
+        self._queues: Dict[str, Deque[ScheduledItem]] = {}
+        self._last_finish: Dict[str, float] = {}
+        self._tokens: Dict[str, float] = {}
+        self._refilled_at: Dict[str, float] = {}
+        self._virtual_time = 0.0
+        self._wakeup = asyncio.Event()
+
+    def __len__(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def put(self, text: str, source: str):
+        weight = self.weights.get(source, 1.0)
+        start = max(self._virtual_time, self._last_finish.get(source, 0.0))
+        item = ScheduledItem(text=text, source=source, finish_tag=start + 1 / weight)
+        self._last_finish[source] = item.finish_tag
+
+        self._queues.setdefault(source, deque()).append(item)
+        queued_news_gauge.labels(source).inc()
+        self._wakeup.set()
+
+    async def get(self) -> ScheduledItem:
+        while True:
+            item, retry_in = self._pop_next()
+            if item is not None:
+                return item
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=retry_in)
+            except asyncio.TimeoutError:
+                pass
+
+    def pop_all(self) -> List[ScheduledItem]:
+        """Remove and return every queued item, oldest first"""
+        items = []
+        for source, queue in self._queues.items():
+            items.extend(queue)
+            queued_news_gauge.labels(source).dec(len(queue))
+            queue.clear()
+        return sorted(items, key=lambda item: item.enqueued_at)
+
+    def _pop_next(self):
+        """Return the next eligible item, or the time to wait before retrying"""
+        now = time.monotonic()
+        self._shed_stale(now)
+
+        best = None
+        retry_in = None
+        for source, queue in self._queues.items():
+            if not queue:
+                continue
+
+            wait = self._token_wait(source, now)
+            if wait > 0:
+                retry_in = wait if retry_in is None else min(retry_in, wait)
+                continue
+
+            key = (-self.priorities.get(source, 0), queue[0].finish_tag)
+            if best is None or key < best[0]:
+                best = (key, source)
+
+        if best is None:
+            return None, retry_in
+
+        source = best[1]
+        item = self._queues[source].popleft()
+        queued_news_gauge.labels(source).dec()
+        self._virtual_time = max(self._virtual_time, item.finish_tag)
+        if source in self.rate_limits:
+            self._tokens[source] -= 1
+        return item, None
+
+    def _token_wait(self, source: str, now: float) -> float:
+        """Refill the token bucket of a rate limited source"""
+        rate = self.rate_limits.get(source)
+        if rate is None:
+            return 0.0
+
+        per_second = rate / 60
+        tokens = self._tokens.get(source, 1.0)
+        refilled_at = self._refilled_at.get(source, now)
+        tokens = min(1.0, tokens + (now - refilled_at) * per_second)
+        self._tokens[source] = tokens
+        self._refilled_at[source] = now
+
+        if tokens >= 1.0:
+            return 0.0
+        return (1.0 - tokens) / per_second
+
+    def _shed_stale(self, now: float):
+        if self.max_age is None:
+            return
+
+        for source, queue in self._queues.items():
+            while queue and now - queue[0].enqueued_at > self.max_age:
+                queue.popleft()
+                queued_news_gauge.labels(source).dec()
+                shed_news_counter.labels(source).inc()
+                logger.warning(f"Dropped stale news from {source}")
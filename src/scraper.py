@@ -1,18 +1,74 @@
 from __future__ import annotations
 
 import asyncio
-from typing import Any, Dict, List
+import hashlib
+import signal
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, List
 
+from prometheus_client import Gauge
 from pyrogram import Client
+from pyrogram.errors import PeerIdInvalid
 from pyrogram.types import Message
 
-from src.config import (FETCH_INTERVAL, SESSION_NAME, api_hash, api_id,
-                        chats_to_follow)
+from src.config import (COALESCE_MAX_MESSAGES, COALESCE_WINDOW, DEDUP_HISTORY,
+                        DRAIN_TIMEOUT, FETCH_INTERVAL, SESSION_NAME, api_hash,
+                        api_id, chats_to_follow)
 from src.core import Core
-from src.utils import get_logger
+from src.monitor import LoopMonitor
+from src.utils import get_logger, run_async
 
 logger = get_logger("Scraper")
 
+startup_seconds_gauge = Gauge(
+    "startup_seconds", "Time from scraper start until watching for news began"
+)
+
+
+def _sender_key(message: Message) -> Any:
+    if getattr(message, "from_user", None) is not None:
+        return getattr(message.from_user, "id", None)
+    if getattr(message, "sender_chat", None) is not None:
+        return message.sender_chat.id
+    return message.chat.id
+
+
+def _close_in_time(first: Message, second: Message, window: float) -> bool:
+    if not isinstance(first.date, datetime) or not isinstance(second.date, datetime):
+        return False
+    return abs((second.date - first.date).total_seconds()) <= window
+
+
+def coalesce_messages(
+    messages: List[Message],
+    window: float,
+    max_messages: int = COALESCE_MAX_MESSAGES,
+) -> List[List[Message]]:
+    """Group album parts and split posts of one sender into single news items.
+
+    Messages must be ordered oldest first. Consecutive messages sharing a
+    media_group_id, or sent by the same sender within window seconds of
+    the first message of the group, end up in the same group. Groups hold
+    at most max_messages, so a busy channel is not merged into one item.
+    """
+    groups: List[List[Message]] = []
+    for message in messages:
+        if groups and len(groups[-1]) < max_messages:
+            first, previous = groups[-1][0], groups[-1][-1]
+            media_group = getattr(message, "media_group_id", None)
+            same_album = media_group is not None and media_group == getattr(
+                previous, "media_group_id", None
+            )
+            same_sender = _sender_key(message) == _sender_key(first)
+            split_post = same_sender and _close_in_time(first, message, window)
+            if same_album or split_post:
+                groups[-1].append(message)
+                continue
+        groups.append([message])
+    return groups
+
 
 class Scraper:
 
@@ -24,6 +80,7 @@ class Scraper:
         session_name: str = "scraper",
         fetch_interval: int = 5,
         core: Core = None,
+        coalesce_window: float = COALESCE_WINDOW,
     ) -> None:
         self.chats = chats
         self.api_id = api_id
@@ -31,40 +88,103 @@ class Scraper:
         self.session_name = session_name
         self.fetch_interval = fetch_interval
         self.core = core
+        self.coalesce_window = coalesce_window
         self._client: Client | None = None
         self._last_ids: Dict[Any, int] = {}
+        # Recently submitted texts per chat, to skip reposts and re-sent captions
+        self._recent_texts: OrderedDict[tuple, None] = OrderedDict()
+        self._stopping = asyncio.Event()
         logger.info("Scraper initialized")
 
     async def submit_to_core(self, source: str, text: str) -> None:
         await self.core.receive_news(text, source)
-        logger.info(f"[{source}]: {text}")
 
-    async def _process_message(self, message: Message) -> None:
-        source = message.chat.title or message.chat.first_name or str(message.chat.id)
-        text = message.text or message.caption or "[no text]"
+    async def _process_messages(self, messages: List[Message]) -> None:
+        """Submit a group of coalesced messages as one news item"""
+        first = messages[0]
+        source = first.chat.title or first.chat.first_name or str(first.chat.id)
+
+        parts = []
+        for message in messages:
+            part = message.text or message.caption
+            if part and part not in parts:
+                parts.append(part)
+        text = "\n\n".join(parts) or "[no text]"
+
+        key = self._text_key(first.chat.id, text)
+        if key is not None and key in self._recent_texts:
+            self._recent_texts.move_to_end(key)
+            logger.info(f"Skipped duplicate message {first.id} from {source}")
+            return
+
         await self.submit_to_core(source, text)
-        logger.info(f"[{source}]: {text} ({message.date})")
+        logger.info(
+            f"Submitted messages {[message.id for message in messages]} from {source} ({first.date})",
+            extra={"source": source, "payload": text},
+        )
 
-    async def _prime_last_ids(self) -> None:
+        # Only remember texts that reached Core, failed groups are fetched again
+        if key is not None:
+            self._recent_texts[key] = None
+            if len(self._recent_texts) > DEDUP_HISTORY:
+                self._recent_texts.popitem(last=False)
+
+    @staticmethod
+    def _text_key(chat_id: Any, text: str) -> tuple | None:
+        if text == "[no text]":
+            return None
+        return (chat_id, hashlib.sha256(text.encode("utf-8")).hexdigest())
+
+    def _may_grow(self, message: Message) -> bool:
+        """Whether more parts of the message's group may still arrive"""
+        if not isinstance(message.date, datetime):
+            return False
+        now = datetime.now(message.date.tzinfo)
+        return (now - message.date).total_seconds() < self.coalesce_window
+
+    async def _resolve_chats(self) -> None:
+        """Make sure the followed chats are known to the session.
+
+        Peers resolved once are stored in the session file, so usually no
+        request is made. Only when some chat is missing there, the dialogs
+        are scanned to fill the session in.
+        """
         assert self._client is not None
-        logger.info("Priming last message IDs")
+        missing = []
         for chat in self.chats:
             try:
-                async for msg in self._client.get_chat_history(chat, limit=1):
-                    self._last_ids[chat] = msg.id
-                    break
-                else:
-                    self._last_ids[chat] = 0
-            except Exception as exc:
-                logger.error(f"Init fetch error for {chat}: {exc}")
+                await self._client.resolve_peer(chat)
+            except (KeyError, ValueError, PeerIdInvalid):
+                missing.append(chat)
+
+        if missing:
+            logger.info(f"Chats {missing} are not in the session, loading dialogs")
+            async for _ in self._client.get_dialogs():
+                pass
+
+    async def _prime_chat(self, chat: Any) -> None:
+        try:
+            async for msg in self._client.get_chat_history(chat, limit=1):
+                self._last_ids[chat] = msg.id
+                break
+            else:
                 self._last_ids[chat] = 0
+        except Exception as exc:
+            logger.error(f"Init fetch error for {chat}: {exc}")
+            self._last_ids[chat] = 0
+
+    async def _prime_last_ids(self) -> None:
+        assert self._client is not None
+        logger.info("Priming last message IDs")
+        await asyncio.gather(*(self._prime_chat(chat) for chat in self.chats))
 
     async def _watch_loop(self) -> None:
         assert self._client is not None
-        await self._prime_last_ids()
+        if not self._last_ids:
+            await self._prime_last_ids()
         logger.info("Starting watch loop")
 
-        while True:
+        while not self._stopping.is_set():
             for chat in self.chats:
                 try:
                     new_messages: List[Message] = []
@@ -76,25 +196,60 @@ class Scraper:
                     if new_messages:
                         logger.info(f"Found {len(new_messages)} new messages in {chat}")
 
-                    for msg in reversed(new_messages):
-                        await self._process_message(msg)
-                        self._last_ids[chat] = msg.id
+                    groups = coalesce_messages(
+                        list(reversed(new_messages)), self.coalesce_window
+                    )
+                    # Leave a fresh trailing group for the next poll to complete
+                    if groups and self._may_grow(groups[-1][-1]):
+                        groups.pop()
+
+                    for group in groups:
+                        await self._process_messages(group)
+                        self._last_ids[chat] = group[-1].id
                 except Exception as exc:
                     logger.error(f"Fetch error for {chat}: {exc}")
-            await asyncio.sleep(self.fetch_interval)
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.fetch_interval)
+            except asyncio.TimeoutError:
+                pass
+        logger.info("Watch loop stopped")
+
+    def stop(self) -> None:
+        """Stop watching after the current poll"""
+        logger.info("Stopping Scraper")
+        self._stopping.set()
+
+    async def connect(self) -> None:
+        """Start the Telegram client and resolve the followed chats"""
+        self._client = Client(self.session_name, self.api_id, self.api_hash)
+        await self._client.start()
+        logger.info("Connected to Telegram")
+        await self._resolve_chats()
+        await self._prime_last_ids()
 
     async def run(self) -> None:
         logger.info("Starting Scraper")
-        async with Client(self.session_name, self.api_id, self.api_hash) as client:
-            self._client = client
-            logger.info("Connected to Telegram")
-            async for _ in client.get_dialogs():
-                pass
+        if self._client is None:
+            await self.connect()
+        try:
             await self._watch_loop()
+        finally:
+            await self._client.stop()
 
 
-def get_scraper(core: Core) -> Scraper:
+def get_scraper(
+    core: Core | None = None,
+    monitor: LoopMonitor | None = None,
+    core_factory: Callable[[], Core] | None = None,
+) -> Scraper:
+    """Run the scraper until stopped by a signal.
+
+    With core_factory the Core is built in a worker thread while
+    connecting to Telegram, so the blocking database setup does not delay
+    startup.
+    """
     logger.info("Initializing scraper")
+    started = time.perf_counter()
     watcher = Scraper(
         chats=chats_to_follow,
         api_id=api_id,
@@ -102,8 +257,32 @@ def get_scraper(core: Core) -> Scraper:
         session_name=SESSION_NAME,
         fetch_interval=FETCH_INTERVAL,
         core=core,
+        coalesce_window=COALESCE_WINDOW,
     )
 
-    asyncio.run(watcher.run())
+    async def main():
+        if monitor is not None:
+            monitor.start()
+
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, watcher.stop)
+
+        if core_factory is not None:
+            watcher.core, _ = await asyncio.gather(
+                asyncio.to_thread(core_factory), watcher.connect()
+            )
+        else:
+            await watcher.connect()
+
+        startup = time.perf_counter() - started
+        startup_seconds_gauge.set(startup)
+        logger.info(f"Started in {startup:.2f}s")
+
+        await watcher.core.resume()
+        await watcher.run()
+        await watcher.core.drain(DRAIN_TIMEOUT)
+
+    run_async(main())
 
     return watcher
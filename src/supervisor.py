@@ -0,0 +1,78 @@
+import asyncio
+from typing import Coroutine, Optional, Set
+
+from prometheus_client import Counter, Gauge
+
+from src.utils import get_logger
+
+logger = get_logger("Supervisor")
+
+supervised_tasks_gauge = Gauge(
+    "supervised_tasks", "Number of running supervised tasks", ["group"]
+)
+failed_tasks_counter = Counter(
+    "failed_tasks_total", "Total number of supervised tasks that raised", ["group"]
+)
+
+
+class SupervisorClosedError(Exception):
+    pass
+
+
+class TaskSupervisor:
+    """Keep references to background tasks, log their failures and drain them"""
+
+    def __init__(self, name: str, max_concurrency: Optional[int] = None):
+        self.name = name
+        self.accepting = True
+        self._tasks: Set[asyncio.Task] = set()
+        self._semaphore = (
+            asyncio.Semaphore(max_concurrency) if max_concurrency is not None else None
+        )
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def spawn(self, coro: Coroutine, name: Optional[str] = None) -> asyncio.Task:
+        if not self.accepting:
+            coro.close()
+            raise SupervisorClosedError(f"Supervisor {self.name} is closed")
+
+        task = asyncio.create_task(self._run(coro), name=name)
+        self._tasks.add(task)
+        supervised_tasks_gauge.labels(self.name).inc()
+        task.add_done_callback(self._on_done)
+        return task
+
+    async def _run(self, coro: Coroutine):
+        if self._semaphore is None:
+            return await coro
+        async with self._semaphore:
+            return await coro
+
+    def _on_done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        supervised_tasks_gauge.labels(self.name).dec()
+        if not task.cancelled() and task.exception() is not None:
+            failed_tasks_counter.labels(self.name).inc()
+            logger.error(
+                f"Task {task.get_name()} in {self.name} failed: {task.exception()!r}"
+            )
+
+    def close(self):
+        """Stop accepting new tasks"""
+        self.accepting = False
+
+    async def wait(self, timeout: float) -> int:
+        """Wait up to timeout for running tasks and return how many are left"""
+        if self._tasks:
+            await asyncio.wait(set(self._tasks), timeout=timeout)
+        return len(self._tasks)
+
+    async def cancel_all(self):
+        tasks = set(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if tasks:
+            logger.warning(f"Cancelled {len(tasks)} tasks in {self.name}")
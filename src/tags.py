@@ -0,0 +1,117 @@
+import re
+import threading
+import time
+import unicodedata
+from typing import Dict, Iterable, List
+
+from src.config import TAG_ALIASES_TTL
+from src.utils import get_logger
+
+logger = get_logger("Tags")
+
+# Common spellings of the same entity, keyed by normalized alias
+DEFAULT_ALIASES = {
+    "us": "United States",
+    "usa": "United States",
+    "united states of america": "United States",
+    "uk": "United Kingdom",
+    "great britain": "United Kingdom",
+    "russian federation": "Russia",
+    "eu": "European Union",
+    "un": "United Nations",
+}
+
+_PUNCTUATION_EDGES = re.compile(r"^[\W_]+|[\W_]+$")
+
+
+def normalize_tag(tag: str) -> str:
+    """Case and Unicode insensitive key of a tag"""
+    tag = unicodedata.normalize("NFKC", tag).casefold().replace(".", "")
+    tag = " ".join(_PUNCTUATION_EDGES.sub("", tag).split())
+    if tag.startswith("the "):
+        tag = tag[4:]
+    return tag
+
+
+class TagCanonicalizer:
+    """Map free-form tags to canonical ones through a persistent alias table.
+
+    The first spelling seen for a normalized tag becomes its canonical form.
+    Aliases live in the storage and are cached in memory for ttl seconds,
+    so aliases changed by other processes are picked up after a reload.
+    """
+
+    def __init__(self, store=None, ttl: float = TAG_ALIASES_TTL):
+        self.store = store
+        self.ttl = ttl
+        self._aliases: Dict[str, str] = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def _ensure_loaded(self):
+        if self._loaded_at is None:
+            self._load()
+        # Without a store the cache is the only copy of the aliases
+        elif self.store is not None and time.monotonic() - self._loaded_at > self.ttl:
+            self._load()
+
+    def _load(self):
+        self._aliases = {
+            normalize_tag(alias): canonical
+            for alias, canonical in DEFAULT_ALIASES.items()
+        }
+        # Canonical forms are aliases of themselves, whatever spelling comes first
+        for canonical in DEFAULT_ALIASES.values():
+            self._aliases[normalize_tag(canonical)] = canonical
+        if self.store is not None:
+            self._aliases.update(self.store.get_tag_aliases())
+        self._loaded_at = time.monotonic()
+        logger.info(f"Loaded {len(self._aliases)} tag aliases")
+
+    def canonicalize(self, tag: str) -> str:
+        key = normalize_tag(tag)
+        with self._lock:
+            self._ensure_loaded()
+            canonical = self._aliases.get(key)
+            if canonical is not None:
+                return canonical
+
+            canonical = " ".join(tag.split()).strip("\"'«»“”")
+            if self.store is not None:
+                # Another process may have registered the alias first
+                canonical = self.store.store_tag_alias(key, canonical)
+            self._aliases[key] = canonical
+            return canonical
+
+    def lookup(self, tag: str) -> str:
+        """Canonical form of a tag without registering new aliases.
+
+        Aliases registered by other processes after loading are looked up
+        in the storage on a miss.
+        """
+        key = normalize_tag(tag)
+        with self._lock:
+            self._ensure_loaded()
+            canonical = self._aliases.get(key)
+            if canonical is None and self.store is not None:
+                canonical = self.store.get_tag_alias(key)
+                if canonical is not None:
+                    self._aliases[key] = canonical
+            return canonical if canonical is not None else tag
+
+    def canonicalize_all(self, tags: Iterable[str]) -> List[str]:
+        result = []
+        for tag in tags:
+            if not normalize_tag(tag):
+                continue
+            canonical = self.canonicalize(tag)
+            if canonical not in result:
+                result.append(canonical)
+        return result
+
+    def add_alias(self, alias: str, canonical: str):
+        key = normalize_tag(alias)
+        with self._lock:
+            if self.store is not None:
+                self.store.store_tag_alias(key, canonical, replace=True)
+            self._aliases[key] = canonical
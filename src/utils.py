@@ -1,15 +1,148 @@
+import asyncio
+import atexit
+import json
 import logging
+import logging.handlers
+import queue
+import random
+from typing import Any, Coroutine
+
+from src.config import (LOG_ASYNC, LOG_BACKUP_COUNT, LOG_FILE, LOG_JSON,
+                        LOG_MAX_BYTES, LOG_PAYLOAD_MAX_CHARS,
+                        LOG_PAYLOAD_SAMPLE_RATE, USE_UVLOOP)
+
+# Record attributes holding news texts, which are truncated and sampled
+PAYLOAD_FIELDS = ("payload", "comment")
+
+_STANDARD_ATTRS = set(logging.makeLogRecord({}).__dict__) | {"message", "asctime"}
+
+_handler = None
+
+
+class PayloadFilter(logging.Filter):
+    """Truncate payload fields and sample which records keep them.
+
+    Records are always kept so news ids stay traceable, sampling only
+    strips the payload fields from them.
+    """
+
+    def __init__(self, max_chars: int, sample_rate: float):
+        super().__init__()
+        self.max_chars = max_chars
+        self.sample_rate = sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        fields = [field for field in PAYLOAD_FIELDS if hasattr(record, field)]
+        if not fields:
+            return True
+        if record.levelno < logging.WARNING and random.random() >= self.sample_rate:
+            for field in fields:
+                delattr(record, field)
+            return True
+        for field in fields:
+            value = str(getattr(record, field))
+            if len(value) > self.max_chars:
+                value = value[: self.max_chars] + f"… [{len(value)} chars]"
+            setattr(record, field, value)
+        return True
+
+
+def _extra_fields(record: logging.LogRecord) -> dict:
+    return {
+        key: value
+        for key, value in record.__dict__.items()
+        if key not in _STANDARD_ATTRS and not key.startswith("_")
+    }
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        extra = _extra_fields(record)
+        payload = {key: extra.pop(key) for key in PAYLOAD_FIELDS if key in extra}
+        if extra:
+            line += " " + " ".join(f"{key}={value}" for key, value in extra.items())
+        for key, value in payload.items():
+            line += f" | {key}: {value}"
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record, self.datefmt),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(_extra_fields(record))
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def _get_handler() -> logging.Handler:
+    """Build the handler shared by all loggers, once per process"""
+    global _handler
+    if _handler is not None:
+        return _handler
+
+    file_handler = logging.handlers.RotatingFileHandler(
+        LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT
+    )
+    formatter_class = JsonFormatter if LOG_JSON else TextFormatter
+    file_handler.setFormatter(
+        formatter_class(
+            "%(asctime)s [%(levelname)s] [%(name)s] %(message)s",
+            datefmt="%Y-%m-%d %H:%M:%S",
+        )
+    )
+
+    if LOG_ASYNC:
+        # File writes happen in the listener thread, off the event loop
+        _handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+        listener = logging.handlers.QueueListener(_handler.queue, file_handler)
+        listener.start()
+        atexit.register(listener.stop)
+    else:
+        _handler = file_handler
+
+    _handler.addFilter(PayloadFilter(LOG_PAYLOAD_MAX_CHARS, LOG_PAYLOAD_SAMPLE_RATE))
+    return _handler
 
 
 def get_logger(name: str):
     logger = logging.getLogger(name)
     if not logger.handlers:
         logger.setLevel(logging.INFO)
-        file_handler = logging.FileHandler("run.log")
-        formatter = logging.Formatter(
-            "%(asctime)s [%(levelname)s] [%(name)s] %(message)s",
-            datefmt="%Y-%m-%d %H:%M:%S",
-        )
-        file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
+        logger.addHandler(_get_handler())
     return logger
+
+
+def summarize(text: str, max_chars: int) -> str:
+    """Cut text down to max_chars, preferring sentence and word boundaries"""
+    text = " ".join(text.split())
+    if len(text) <= max_chars:
+        return text
+
+    cut = text[: max_chars - 1]
+    sentence_end = max(cut.rfind(". "), cut.rfind("! "), cut.rfind("? "))
+    if sentence_end >= max_chars // 2:
+        return cut[: sentence_end + 1]
+
+    word_end = cut.rfind(" ")
+    if word_end >= max_chars // 2:
+        cut = cut[:word_end]
+    return cut.rstrip() + "…"
+
+
+def run_async(main: Coroutine) -> Any:
+    """Run the coroutine to completion, on a uvloop event loop when available"""
+    if USE_UVLOOP:
+        try:
+            import uvloop
+        except ImportError:
+            get_logger("Runtime").warning("uvloop is not installed, using asyncio loop")
+        else:
+            return uvloop.run(main)
+    return asyncio.run(main)
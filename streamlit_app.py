@@ -3,7 +3,8 @@ from datetime import datetime
 
 import streamlit as st
 
-from src.config import DB_NAME, DB_PASSWORD, DB_USER
+from src.config import (DB_NAME, DB_PASSWORD, DB_USER, FEED_PAGE_SIZE,
+                        RENDER_CACHE_SIZE, TAGS_CACHE_TTL)
 from src.db import PostgreStorage
 
 # Configure Streamlit page
@@ -18,42 +19,46 @@ st.set_page_config(
 def init_database():
     """Initialize database connection"""
     try:
-        return PostgreStorage(dbname=DB_NAME, user=DB_USER, password=DB_PASSWORD)
+        return PostgreStorage(
+            dbname=DB_NAME, user=DB_USER, password=DB_PASSWORD, autocommit=True
+        )
     except Exception as e:
         st.error(f"Failed to connect to database: {e}")
         return None
 
 
+TAG_COLORS = [
+    "#FF6B6B",
+    "#4ECDC4",
+    "#45B7D1",
+    "#96CEB4",
+    "#FECA57",
+    "#FF9FF3",
+    "#54A0FF",
+]
+
+
 def format_tags(tags):
     """Format tags as colored pills in one line"""
     if not tags:
         return ""
 
-    tag_html = ""
-    colors = [
-        "#FF6B6B",
-        "#4ECDC4",
-        "#45B7D1",
-        "#96CEB4",
-        "#FECA57",
-        "#FF9FF3",
-        "#54A0FF",
-    ]
-
-    for i, tag in enumerate(tags):
-        color = colors[i % len(colors)]
-        tag_html += f'<span style="background-color: {color}; color: white; padding: 4px 8px; border-radius: 15px; font-size: 12px; margin: 2px; display: inline-block; white-space: nowrap;">{tag}</span>'
+    tag_html = "".join(
+        f'<span style="background-color: {TAG_COLORS[i % len(TAG_COLORS)]}; color: white; padding: 4px 8px; border-radius: 15px; font-size: 12px; margin: 2px; display: inline-block; white-space: nowrap;">{tag}</span>'
+        for i, tag in enumerate(tags)
+    )
 
     return f'<div style="white-space: nowrap; overflow-x: auto;">{tag_html}</div>'
 
 
-def display_news_item(news_item):
-    """Display a single news item"""
-    news_id, text, tags = news_item["id"], news_item["text"], news_item["tags"]
+@st.cache_data(max_entries=RENDER_CACHE_SIZE, show_spinner=False)
+def render_news_item(news_id, version, _text, _tags):
+    """Build the HTML of a news item, cached by id and version.
 
-    with st.container():
-        st.markdown(
-            f"""
+    Records are rewritten in place by store() and imports, so version has to
+    change with the content.
+    """
+    return f"""
         <div style="
             border: 1px solid #ddd; 
             border-radius: 10px; 
@@ -65,15 +70,35 @@ def display_news_item(news_item):
                 News ID: {news_id}
             </div>
             <div style="font-size: 16px; line-height: 1.5; margin-bottom: 10px;">
-                {text}
+                {_text}
             </div>
-                {format_tags(tags)}
+                {format_tags(_tags)}
         </div>
-        """,
-            unsafe_allow_html=True,
+        """
+
+
+def display_news_item(news_item):
+    """Display a single news item"""
+    news_id, text, tags = news_item["id"], news_item["text"], news_item["tags"]
+
+    with st.container():
+        # Hashing is much cheaper than rendering and the cache lives in this process
+        version = hash((text, tuple(tags or ())))
+        st.markdown(
+            render_news_item(news_id, version, text, tags), unsafe_allow_html=True
         )
 
 
+@st.cache_data(ttl=TAGS_CACHE_TTL, show_spinner=False)
+def load_tags(_db):
+    """Get tags for the filter without loading the records"""
+    return _db.get_tags()
+
+
+def load_more():
+    st.session_state.feed_size += FEED_PAGE_SIZE
+
+
 def main():
     st.title("📰 Neuromedia News Feed")
     st.markdown("Real-time news feed with AI-generated tags")
@@ -91,11 +116,23 @@ def main():
     if db is None:
         return
 
-    # Get all records
     try:
-        all_records = db.get_all()
+        selected_tags = st.sidebar.multiselect(
+            "Select tags to filter:", options=load_tags(db), default=[]
+        )
+
+        # Show the first page again when the filter changes
+        if st.session_state.get("feed_filter") != selected_tags:
+            st.session_state.feed_filter = selected_tags
+            st.session_state.feed_size = FEED_PAGE_SIZE
+        feed_size = st.session_state.feed_size
 
-        if not all_records:
+        # Only the visible window is loaded, one extra record tells if there is more
+        records = db.get_page(feed_size + 1, any_tags=selected_tags)
+        has_more = len(records) > feed_size
+        records = records[:feed_size]
+
+        if not records and not selected_tags:
             st.info(
                 "No news items found. The feed will update as new news is processed."
             )
@@ -109,33 +146,16 @@ def main():
                 st.rerun()
             return
 
-        # Extract all unique tags for filtering
-        all_tags = set()
-        for record in all_records:
-            if record["tags"]:
-                all_tags.update(record["tags"])
-
-        selected_tags = st.sidebar.multiselect(
-            "Select tags to filter:", options=sorted(all_tags), default=[]
-        )
-
-        # Filter records by selected tags
-        if selected_tags:
-            filtered_records = []
-            for record in all_records:
-                if record["tags"] and any(
-                    tag in record["tags"] for tag in selected_tags
-                ):
-                    filtered_records.append(record)
-        else:
-            filtered_records = all_records
-
         st.markdown("---")
 
         # Display news items
-        if filtered_records:
-            for news_item in filtered_records:
+        if records:
+            for news_item in records:
                 display_news_item(news_item)
+            if has_more:
+                st.button(
+                    f"⬇️ Load {FEED_PAGE_SIZE} more", on_click=load_more, key="load_more"
+                )
         else:
             st.info("No news items match the selected tag filters.")
 
@@ -0,0 +1,109 @@
+from datetime import datetime, timezone
+
+import pytest
+import pytest_asyncio
+from aiohttp.test_utils import TestClient, TestServer
+
+from src.api import create_app
+
+RECORDS = [
+    {
+        "id": record_id,
+        "text": f"news {record_id}",
+        "tags": ["even" if record_id % 2 == 0 else "odd"],
+        "source": "chat",
+        "created_at": datetime(2025, 5, 3, tzinfo=timezone.utc),
+    }
+    for record_id in range(1, 8)
+]
+
+
+class DummyStorage:
+    def __init__(self):
+        self.queries = 0
+
+    def lookup_tag(self, tag):
+        return {"Even": "even"}.get(tag, tag)
+
+    def get_page(self, limit, before_id=None, tag=None):
+        self.queries += 1
+        records = [
+            record
+            for record in reversed(RECORDS)
+            if (before_id is None or record["id"] < before_id)
+            and (tag is None or tag in record["tags"])
+        ]
+        return records[:limit]
+
+    def get(self, record_id):
+        self.queries += 1
+        return next((r for r in RECORDS if r["id"] == record_id), None)
+
+    def close(self):
+        pass
+
+
+@pytest_asyncio.fixture
+async def api():
+    storage = DummyStorage()
+    client = TestClient(TestServer(create_app(lambda: storage, pool_size=1)))
+    await client.start_server()
+    yield client, storage
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_feed_pagination(api):
+    client, _ = api
+
+    response = await client.get("/news", params={"limit": 3})
+    page = await response.json()
+    assert [item["id"] for item in page["items"]] == [7, 6, 5]
+    assert page["items"][0]["created_at"] == "2025-05-03T00:00:00+00:00"
+
+    response = await client.get("/news", params={"limit": 3, "cursor": 5})
+    page = await response.json()
+    assert [item["id"] for item in page["items"]] == [4, 3, 2]
+
+    response = await client.get("/news", params={"limit": 3, "cursor": 2})
+    page = await response.json()
+    assert [item["id"] for item in page["items"]] == [1]
+    assert page["next_cursor"] is None
+
+
+@pytest.mark.asyncio
+async def test_by_tag_uses_canonical_tag(api):
+    client, _ = api
+
+    response = await client.get("/news/tag/Even")
+    page = await response.json()
+
+    assert [item["id"] for item in page["items"]] == [6, 4, 2]
+
+
+@pytest.mark.asyncio
+async def test_by_id(api):
+    client, _ = api
+
+    response = await client.get("/news/3")
+    assert (await response.json())["text"] == "news 3"
+
+    assert (await client.get("/news/100")).status == 404
+    assert (await client.get("/news/abc")).status == 400
+
+
+@pytest.mark.asyncio
+async def test_etag_and_shared_cache(api):
+    client, storage = api
+
+    response = await client.get("/news")
+    etag = response.headers["ETag"]
+    queries = storage.queries
+
+    response = await client.get("/news", headers={"If-None-Match": etag})
+    assert response.status == 304
+    assert storage.queries == queries
+
+    response = await client.get("/news", headers={"If-None-Match": '"other"'})
+    assert response.status == 200
+    assert response.headers["ETag"] == etag
@@ -0,0 +1,33 @@
+import pytest
+
+from src.archive import export_records, import_records
+
+
+@pytest.mark.parametrize("fmt", ["jsonl", "csv"])
+def test_export_import_roundtrip(db, tmp_path, fmt):
+    db.store(101, "First, news", ["tag1", "tag, with comma"], source="chat")
+    db.store(102, 'Second "quoted" news\nin two lines', [], source=None)
+
+    path = str(tmp_path / f"records.{fmt}")
+    progress = []
+    assert export_records(db, path, fmt, batch_size=1, progress=progress.append) == 2
+    assert progress
+
+    before = [dict(row) for row in db.get_all()]
+    db.delete(101)
+    db.store(102, "Changed", ["tag3"])
+
+    assert import_records(db, path, fmt) == 2
+    assert [dict(row) for row in db.get_all()] == before
+
+
+def test_import_fills_missing_fields(db, tmp_path):
+    path = tmp_path / "records.jsonl"
+    path.write_text('{"id": 103, "text": "Imported news", "tags": ["tag"]}\n')
+
+    assert import_records(db, str(path), "jsonl") == 1
+
+    result = db.get(103)
+    assert result["text"] == "Imported news"
+    assert result["created_at"] is not None
+    assert db.get_by_tag("tag")[0]["summary"] == "Imported news"
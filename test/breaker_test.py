@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+
+from src.breaker import CircuitBreaker
+
+
+def test_opens_after_threshold():
+    breaker = CircuitBreaker("test-open", failure_threshold=2, reset_timeout=60)
+
+    breaker.record_failure()
+    assert breaker.allow_request()
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+
+
+def test_success_resets_failures():
+    breaker = CircuitBreaker("test-reset", failure_threshold=2, reset_timeout=60)
+
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_after_timeout():
+    breaker = CircuitBreaker("test-half-open", failure_threshold=1, reset_timeout=0)
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow_request()
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_failure_reopens():
+    breaker = CircuitBreaker("test-reopen", failure_threshold=3, reset_timeout=60)
+    breaker._state = CircuitBreaker.HALF_OPEN
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+@pytest.mark.asyncio
+async def test_wait_until_available():
+    breaker = CircuitBreaker("test-wait", failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+
+    await asyncio.wait_for(breaker.wait_until_available(poll_interval=0.01), 1)
+    assert breaker.allow_request()
@@ -0,0 +1,47 @@
+import pytest
+
+from src.cache import ResultCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache.sqlite3"), max_bytes=1024)
+    yield cache
+    cache.close()
+
+
+def test_set_and_get(cache):
+    key = ResultCache.make_key("model", 1, "tags", "text")
+    assert cache.get("tags", key) is None
+
+    cache.set(key, '{"tags": ["a"]}')
+    assert cache.get("tags", key) == '{"tags": ["a"]}'
+
+
+def test_key_depends_on_all_parts():
+    assert ResultCache.make_key("m", 1, "text", [1, 2]) != ResultCache.make_key(
+        "m", 1, "text", [1, 3]
+    )
+    assert ResultCache.make_key("m", 1, "text") != ResultCache.make_key("m", 2, "text")
+
+
+def test_persists_between_instances(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    first = ResultCache(path, max_bytes=1024)
+    first.set("key", "value")
+    first.close()
+
+    second = ResultCache(path, max_bytes=1024)
+    assert second.get("tags", "key") == "value"
+    second.close()
+
+
+def test_evicts_least_recently_used(cache):
+    cache.set("a", "x" * 400)
+    cache.set("b", "x" * 400)
+    cache.get("tags", "a")
+    cache.set("c", "x" * 400)
+
+    assert cache.get("tags", "a") is not None
+    assert cache.get("tags", "b") is None
+    assert cache.get("tags", "c") is not None
@@ -0,0 +1,32 @@
+import os
+
+import pytest
+
+from src.db import PostgreStorage
+
+
+def connect_storage(**kwargs) -> PostgreStorage:
+    return PostgreStorage(
+        dbname=os.getenv("DB_NAME", "mydb"),
+        user=os.getenv("DB_USER", "pguser"),
+        password=os.getenv("DB_PASSWORD", "secret"),
+        host=os.getenv("DB_HOST", "localhost"),
+        port=5433,
+        **kwargs,
+    )
+
+
+@pytest.fixture(scope="session")
+def storage_factory():
+    return connect_storage
+
+
+@pytest.fixture(scope="module")
+def db():
+    storage = connect_storage()
+    yield storage
+
+    with storage.conn:
+        with storage.conn.cursor() as cur:
+            cur.execute("DELETE FROM records;")
+            cur.execute("DELETE FROM tag_aliases;")
@@ -6,6 +6,10 @@ import pytest
 from src.core import Core
 
 
+async def never_finishes(news_id):
+    await asyncio.Event().wait()
+
+
 @pytest.mark.asyncio
 async def test_core_processes_news_ok():
     mock_db = AsyncMock()
@@ -13,21 +17,24 @@ async def test_core_processes_news_ok():
 
     mock_ml = AsyncMock()
     mock_ml.submit = AsyncMock(return_value="id123")
-    mock_ml.get_status = AsyncMock(
-        side_effect=[
-            {"state": "processing"},
-            {"state": "ok", "rewritten_text": "rewritten!", "tags": ["tag1", "tag2"]},
-        ]
+    mock_ml.wait_result = AsyncMock(
+        return_value={
+            "state": "ok",
+            "rewritten_text": "rewritten!",
+            "tags": ["tag1", "tag2"],
+        }
     )
 
     core = Core(db=mock_db, ml_client=mock_ml)
 
     task = asyncio.create_task(core.receive_news("original text", "test.com"))
 
-    await asyncio.sleep(3)
+    await asyncio.sleep(0.1)
 
     mock_ml.submit.assert_called_once()
-    mock_db.store.assert_called_with("id123", "rewritten!", ["tag1", "tag2"])
+    mock_db.store.assert_called_with(
+        "id123", "rewritten!", ["tag1", "tag2"], source="test.com"
+    )
 
     task.cancel()
 
@@ -39,16 +46,98 @@ async def test_core_drops_news():
 
     mock_ml = AsyncMock()
     mock_ml.submit = AsyncMock(return_value="id456")
-    mock_ml.get_status = AsyncMock(
-        side_effect=[{"state": "processing"}, {"state": "drop"}]
-    )
+    mock_ml.wait_result = AsyncMock(return_value={"state": "drop"})
 
     core = Core(db=mock_db, ml_client=mock_ml)
 
     task = asyncio.create_task(core.receive_news("drop this", "spam.com"))
 
-    await asyncio.sleep(3)
+    await asyncio.sleep(0.1)
 
     mock_db.store.assert_not_called()
 
     task.cancel()
+
+
+@pytest.mark.asyncio
+async def test_core_limits_in_flight_news_with_scheduler():
+    from src.scheduler import FairScheduler
+
+    mock_db = AsyncMock()
+    mock_db.store = AsyncMock()
+
+    mock_ml = AsyncMock()
+    mock_ml.submit = AsyncMock(side_effect=["id1", "id2"])
+    mock_ml.wait_result = AsyncMock(side_effect=never_finishes)
+
+    core = Core(
+        db=mock_db, ml_client=mock_ml, scheduler=FairScheduler(), max_in_flight=1
+    )
+
+    await core.receive_news("first", "a.com")
+    await core.receive_news("second", "b.com")
+    await asyncio.sleep(0.1)
+
+    mock_ml.submit.assert_called_once_with("first", "a.com")
+    assert len(core.scheduler) == 1
+
+    core._dispatcher.cancel()
+    for task in asyncio.all_tasks():
+        if task is not asyncio.current_task():
+            task.cancel()
+
+
+@pytest.mark.asyncio
+async def test_core_skips_filtered_news():
+    from src.filters import ContentFilter
+
+    mock_ml = AsyncMock()
+    core = Core(
+        db=AsyncMock(), ml_client=mock_ml, content_filter=ContentFilter(min_length=5)
+    )
+
+    await core.receive_news("ok", "me")
+
+    mock_ml.submit.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_core_drain_checkpoints_unfinished_news(tmp_path):
+    from src.scheduler import FairScheduler
+
+    checkpoint = str(tmp_path / "pending.jsonl")
+
+    mock_ml = AsyncMock()
+    mock_ml.submit = AsyncMock(side_effect=["id1", "id2", "id3", "id4"])
+    mock_ml.wait_result = AsyncMock(side_effect=never_finishes)
+
+    core = Core(
+        db=AsyncMock(),
+        ml_client=mock_ml,
+        scheduler=FairScheduler(),
+        max_in_flight=1,
+        checkpoint_path=checkpoint,
+    )
+    await core.receive_news("in flight", "a.com")
+    await core.receive_news("queued", "b.com")
+    await asyncio.sleep(0.05)
+
+    await core.drain(timeout=0.05)
+    await core.receive_news("late", "c.com")
+
+    mock_ml.shutdown.assert_called_once()
+    assert core.pending_tasks == {}
+    assert len(core.supervisor) == 0
+
+    resumed = Core(db=AsyncMock(), ml_client=mock_ml, checkpoint_path=checkpoint)
+    await resumed.resume()
+
+    submitted = [call.args for call in mock_ml.submit.call_args_list[1:]]
+    assert submitted == [
+        ("queued", "b.com"),
+        ("in flight", "a.com"),
+        ("late", "c.com"),
+    ]
+    for task in asyncio.all_tasks():
+        if task is not asyncio.current_task():
+            task.cancel()
@@ -1,25 +1,6 @@
-import os
-
+import psycopg2.errors
 import pytest
 
-from src.db import PostgreStorage
-
-
-@pytest.fixture(scope="module")
-def db():
-    storage = PostgreStorage(
-        dbname=os.getenv("DB_NAME", "mydb"),
-        user=os.getenv("DB_USER", "pguser"),
-        password=os.getenv("DB_PASSWORD", "secret"),
-        host=os.getenv("DB_HOST", "localhost"),
-        port=5433,
-    )
-    yield storage
-
-    with storage.conn:
-        with storage.conn.cursor() as cur:
-            cur.execute("DELETE FROM records;")
-
 
 def test_store_and_get(db):
     db.store(1, "Hello world", ["tag1", "tag2"])
@@ -49,3 +30,190 @@ def test_delete(db):
     db.store(2, "To delete", ["tag"])
     db.delete(2)
     assert db.get(2) is None
+
+
+def test_store_keeps_source_and_created_at(db):
+    db.store(3, "With source", ["tag"], source="chat")
+    created_at = db.get(3)["created_at"]
+
+    db.store(3, "Updated", ["tag"])
+    result = db.get(3)
+
+    assert result["source"] == "chat"
+    assert result["created_at"] == created_at
+
+
+def test_get_by_tag_window(db):
+    from datetime import datetime, timedelta, timezone
+
+    old = datetime.now(timezone.utc) - timedelta(days=10)
+    db.create_partitions(since=old)
+    db.store(4, "Old news", ["window"], created_at=old)
+    db.store(5, "Fresh news", ["window"])
+
+    assert len(db.get_by_tag("window")) == 2
+
+    result = db.get_by_tag("window", window=timedelta(hours=48))
+    assert [row["id"] for row in result] == [5]
+
+
+def test_store_canonicalizes_tags(db):
+    db.store(6, "Canonical tags", ["USA", "usa", "Tag1"])
+
+    assert db.get(6)["tags"] == ["United States", "tag1"]
+    assert db.get_tag_aliases()["tag1"] == "tag1"
+
+
+def test_get_page(db):
+    for record_id in range(10, 15):
+        db.store(record_id, f"Page news {record_id}", ["page", f"tag{record_id % 2}"])
+
+    result = db.get_page(2, tag="page")
+    assert [row["id"] for row in result] == [14, 13]
+
+    result = db.get_page(2, before_id=13, tag="page")
+    assert [row["id"] for row in result] == [12, 11]
+
+    result = db.get_page(10, before_id=14, tag="tag0")
+    assert [row["id"] for row in result] == [12, 10]
+
+    result = db.get_page(10, tag="page", any_tags=["tag1", "missing"])
+    assert [row["id"] for row in result] == [13, 11]
+
+
+def test_get_tags(db):
+    db.store(20, "First news", ["beta", "alpha"])
+    db.store(21, "Second news", ["beta", "gamma"])
+
+    tags = db.get_tags()
+    assert {"alpha", "beta", "gamma"} <= set(tags)
+    assert tags == sorted(set(tags))
+
+
+def test_connecting_does_not_wait_for_open_readers(db, storage_factory, monkeypatch):
+    # A reader idle in transaction holds a lock that any ALTER would wait for
+    with db.conn.cursor() as cur:
+        cur.execute("SELECT id FROM records LIMIT 1;")
+    monkeypatch.setenv("PGOPTIONS", "-c lock_timeout=2000")
+
+    try:
+        storage_factory().close()
+    finally:
+        db.conn.rollback()
+
+
+def test_ids_stay_unique(db):
+    from datetime import datetime, timezone
+
+    january = datetime(2025, 1, 10, tzinfo=timezone.utc)
+    february = datetime(2025, 2, 10, tzinfo=timezone.utc)
+
+    db.create_partitions(since=january)
+    db.store(40, "First version", created_at=january)
+    db.store(40, "Second version", created_at=february)
+    rows = db.import_rows(
+        [
+            {"id": 41, "text": "Old import", "created_at": january},
+            {"id": 41, "text": "New import", "created_at": february},
+        ]
+    )
+
+    assert rows == 1
+    assert db.get(40)["text"] == "Second version"
+    assert db.get(41)["text"] == "New import"
+    with db.conn.cursor() as cur:
+        cur.execute("SELECT count(*) FROM records WHERE id IN (40, 41);")
+        assert cur.fetchone()["count"] == 2
+        cur.execute("SELECT to_regclass('records_2025_01_id_key') AS idx;")
+        assert cur.fetchone()["idx"] is not None or not db.partitioned
+    db.conn.rollback()
+
+
+def test_autocommit_readers_do_not_hold_transactions(db, storage_factory):
+    from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+    reader = storage_factory(autocommit=True)
+    try:
+        reader.get_page(5)
+        reader.lookup_tag("OpenAI")
+        assert reader.conn.info.transaction_status == TRANSACTION_STATUS_IDLE
+    finally:
+        reader.close()
+
+
+def test_lookup_tag_sees_aliases_of_other_connections(db, storage_factory):
+    reader = storage_factory(autocommit=True)
+    try:
+        assert reader.lookup_tag("newcomer") == "newcomer"
+        db.store(50, "News about a newcomer", ["NewComer"])
+        assert reader.lookup_tag("newcomer") == "NewComer"
+    finally:
+        reader.close()
+
+
+def test_store_does_not_create_partitions(db):
+    from datetime import datetime, timezone
+
+    if not db.partitioned:
+        pytest.skip("records is not partitioned")
+
+    created = db.create_partitions(months_ahead=1)
+    assert db.create_partitions(months_ahead=1) == []
+    assert all(name.startswith("records_") for name in created)
+
+    with db.conn.cursor() as cur:
+        cur.execute("DROP TABLE IF EXISTS records_2001_01;")
+    db.conn.commit()
+    db._partitions.discard("records_2001_01")
+    with pytest.raises(psycopg2.errors.CheckViolation):
+        db.store(60, "Too old", created_at=datetime(2001, 1, 5, tzinfo=timezone.utc))
+    db.conn.rollback()
+
+
+@pytest.fixture
+def legacy_db(db, storage_factory, monkeypatch):
+    with db.conn.cursor() as cur:
+        cur.execute("DROP SCHEMA IF EXISTS legacy_test CASCADE;")
+        cur.execute("CREATE SCHEMA legacy_test;")
+        cur.execute(
+            """
+            CREATE TABLE legacy_test.records(
+                id INTEGER PRIMARY KEY,
+                text TEXT NOT NULL,
+                tags TEXT[]
+            );
+        """
+        )
+        cur.execute(
+            "INSERT INTO legacy_test.records VALUES (1, 'Old', '{old}'), (2, 'Older', NULL);"
+        )
+    db.conn.commit()
+
+    monkeypatch.setenv("PGOPTIONS", "-c search_path=legacy_test")
+    storage = storage_factory()
+    yield storage
+
+    storage.close()
+    with db.conn.cursor() as cur:
+        cur.execute("DROP SCHEMA legacy_test CASCADE;")
+    db.conn.commit()
+
+
+def test_partition_legacy_table(legacy_db):
+    from datetime import datetime, timedelta, timezone
+
+    assert not legacy_db.partitioned
+    # Rows stored before created_at existed are not mistaken for fresh ones
+    assert legacy_db.get_by_tag("old", window=timedelta(days=2)) == []
+
+    legacy_created_at = datetime(2024, 6, 1, tzinfo=timezone.utc)
+    assert legacy_db.partition_table(legacy_created_at) == 2
+    assert legacy_db.partitioned
+    assert legacy_db.get(1)["created_at"] == legacy_created_at
+    assert legacy_db.create_partitions() == []
+
+    legacy_db.store(3, "New", ["new"])
+    assert [row["id"] for row in legacy_db.get_page(10)] == [3, 2, 1]
+    assert legacy_db.apply_retention(timedelta(days=30), archive=False) > 0
+    assert legacy_db.get(1) is None
+    assert legacy_db.get(3)["text"] == "New"
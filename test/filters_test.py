@@ -0,0 +1,53 @@
+import pytest
+
+from src.filters import ContentFilter, emoji_ratio, link_ratio
+
+NEWS = "Центробанк повысил ключевую ставку до 21% годовых, сообщает регулятор."
+
+
+@pytest.fixture
+def content_filter():
+    return ContentFilter(
+        min_length=20,
+        max_link_ratio=0.5,
+        max_emoji_ratio=0.3,
+        blocked_patterns=[r"#реклама"],
+    )
+
+
+def test_ratios():
+    assert link_ratio("") == 0.0
+    assert link_ratio("https://t.me/news") == 1.0
+    assert emoji_ratio("🔥🔥ok") == 0.5
+
+
+def test_accepts_news(content_filter):
+    assert content_filter.check(NEWS) is None
+    assert content_filter.check(NEWS + " https://example.com/article") is None
+
+
+@pytest.mark.parametrize(
+    "text, reason",
+    [
+        ("ok", "too_short"),
+        ("[no text]", "too_short"),
+        (
+            "Read the full story here https://example.com/some/very/long/link/to/article/2025",
+            "links",
+        ),
+        ("🔥" * 30 + " Breaking news today here", "emoji"),
+        (NEWS + " #реклама", "blocked_pattern"),
+    ],
+)
+def test_rejects(content_filter, text, reason):
+    assert content_filter.check(text) == reason
+
+
+def test_classifier_and_custom_rules():
+    content_filter = ContentFilter(classifier=lambda text: 0.1)
+    assert content_filter.check(NEWS) == "classifier"
+
+    content_filter = ContentFilter()
+    content_filter.add_rule("poll", lambda text: text.startswith("Poll:"))
+    assert content_filter.check("Poll: what do you think?") == "poll"
+    assert content_filter.check(NEWS) is None
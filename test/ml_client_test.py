@@ -4,6 +4,7 @@ from unittest.mock import MagicMock
 import pytest
 
 from src.ml_client import MLClient, RewrittenNews
+from src.tags import TagCanonicalizer
 
 
 @pytest.fixture
@@ -12,6 +13,9 @@ def dummy_db():
     db = MagicMock()
     db.get_max_id.return_value = 0  # Start counter from 1
     db.get_by_tag.return_value = []  # Return empty list for any tag
+    db.get_tag_aliases.return_value = {}
+    db.store_tag_alias.side_effect = lambda alias, canonical: canonical
+    db.tags = TagCanonicalizer(store=db)
     return db
 
 
@@ -23,7 +27,9 @@ def client(dummy_db):
 @pytest.mark.asyncio
 async def test_submit_returns_int_and_initial_state(client, monkeypatch):
     """Test that submit returns an integer ID and sets initial processing state"""
-    monkeypatch.setattr(asyncio, "create_task", lambda coro: None)
+    monkeypatch.setattr(
+        client.supervisor, "spawn", lambda coro, name=None: coro.close()
+    )
 
     task_id = await client.submit("some text", "source-A")
 
@@ -97,6 +103,34 @@ async def test_process_task_failure_sets_drop_state(client, monkeypatch):
     assert status == {"state": "drop"}
 
 
+@pytest.mark.asyncio
+async def test_wait_result_outlasts_slow_processing(client, monkeypatch):
+    """Test that waiting for a result has no deadline of its own"""
+    release = asyncio.Event()
+
+    async def slow_run_llm(func, *args):
+        await release.wait()
+        return func(*args)
+
+    monkeypatch.setattr(client, "_run_llm", slow_run_llm)
+    monkeypatch.setattr(client, "_get_tags", lambda text: ["AI"])
+    monkeypatch.setattr(
+        client,
+        "_rewrite_text",
+        lambda text, context: RewrittenNews(rewritten_text="done", comment=""),
+    )
+
+    task_id = await client.submit("slow news", "source-C")
+    waiter = asyncio.create_task(client.wait_result(task_id))
+    await asyncio.sleep(0.05)
+    assert not waiter.done()
+
+    release.set()
+    status = await asyncio.wait_for(waiter, 1)
+    assert status["state"] == "ok"
+    assert status["rewritten_text"] == "done"
+
+
 @pytest.mark.asyncio
 async def test_get_status_not_found(client):
     """Test get_status for non-existent task"""
@@ -107,7 +141,9 @@ async def test_get_status_not_found(client):
 @pytest.mark.asyncio
 async def test_counter_increments(client, monkeypatch):
     """Test that task IDs increment properly"""
-    monkeypatch.setattr(asyncio, "create_task", lambda coro: None)
+    monkeypatch.setattr(
+        client.supervisor, "spawn", lambda coro, name=None: coro.close()
+    )
 
     task_id1 = await client.submit("text1", "source1")
     task_id2 = await client.submit("text2", "source2")
@@ -130,6 +166,11 @@ async def test_database_integration(client, monkeypatch):
     # Mock database to return sample news
     client.db.get_by_tag.return_value = SAMPLE_NEWS
 
+    # Process the task only once, in the foreground
+    monkeypatch.setattr(
+        client.supervisor, "spawn", lambda coro, name=None: coro.close()
+    )
+
     monkeypatch.setattr(client, "_get_tags", lambda text: SAMPLE_TAGS)
     monkeypatch.setattr(client, "_rewrite_text", lambda text, context: SAMPLE_REWRITE)
 
@@ -142,3 +183,222 @@ async def test_database_integration(client, monkeypatch):
 
     status = await client.get_status(task_id)
     assert status["state"] == "ok"
+
+
+def test_select_context_ranks_by_shared_tags(client):
+    """Test that news sharing more tags are preferred and returned oldest first"""
+    news_by_tag = [
+        [{"id": 1, "text": "old news"}, {"id": 5, "text": "shared news"}],
+        [{"id": 5, "text": "shared news"}, {"id": 7, "text": "fresh news"}],
+    ]
+
+    context = client._select_context(news_by_tag)
+
+    assert [news["id"] for news in context] == [1, 5, 7]
+
+
+def test_select_context_respects_budget(client, monkeypatch):
+    """Test that context is compressed and cut to fit the prompt budget"""
+    import src.ml_client as ml_client
+
+    monkeypatch.setattr(ml_client, "CONTEXT_CHAR_BUDGET", 50)
+
+    news_by_tag = [
+        [
+            {"id": 1, "text": "a" * 1000},
+            {"id": 2, "text": "long text " * 100, "summary": "short summary"},
+            {"id": 3, "text": "third"},
+        ],
+        [{"id": 2, "text": "long text " * 100, "summary": "short summary"}],
+    ]
+
+    context = client._select_context(news_by_tag)
+
+    assert context == [
+        {"id": 2, "text": "short summary"},
+        {"id": 3, "text": "third"},
+    ]
+
+
+def test_results_are_memoized(dummy_db, tmp_path, monkeypatch):
+    """Test that repeated texts are served from the result cache"""
+    from src.cache import ResultCache
+
+    cache = ResultCache(str(tmp_path / "cache.sqlite3"), max_bytes=1024 * 1024)
+    client = MLClient(dummy_db, cache=cache)
+
+    calls = []
+
+    def fake_chat(call, template, schema):
+        calls.append(call)
+        if call == "tags":
+            return schema(tags=["AI"])
+        return schema(rewritten_text="short", comment="ok")
+
+    monkeypatch.setattr(client, "_chat", fake_chat)
+
+    for _ in range(2):
+        assert client._get_tags("same text") == ["AI"]
+        rewritten = client._rewrite_text("same text", [{"id": 1, "text": "ctx"}])
+        assert rewritten.rewritten_text == "short"
+
+    assert calls == ["tags", "rewrite"]
+
+    client._rewrite_text("same text", [{"id": 2, "text": "ctx"}])
+    assert calls == ["tags", "rewrite", "rewrite"]
+    cache.close()
+
+
+def fake_response(content):
+    from types import SimpleNamespace
+
+    return SimpleNamespace(
+        message=SimpleNamespace(content=content), prompt_eval_duration=None
+    )
+
+
+def test_chat_retries_transient_errors(client, monkeypatch):
+    """Test that transient server errors are retried with backoff"""
+    import src.ml_client as ml_client
+
+    monkeypatch.setattr(ml_client.time, "sleep", lambda delay: None)
+    responses = [
+        ConnectionError("server down"),
+        fake_response('{"tags": ["AI"]}'),
+    ]
+
+    def fake_chat(**kwargs):
+        result = responses.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    monkeypatch.setattr(client._ollama, "chat", fake_chat)
+
+    assert client._chat("tags", "prompt", ml_client.NewsTags).tags == ["AI"]
+    assert client.breaker.state == "closed"
+
+
+def test_chat_uses_precomputed_schema(client, monkeypatch):
+    """Test that the JSON schema is not regenerated for every call"""
+    import src.ml_client as ml_client
+
+    formats = []
+
+    def fake_chat(format, **kwargs):
+        formats.append(format)
+        return fake_response('{"tags": ["AI"]}')
+
+    monkeypatch.setattr(client._ollama, "chat", fake_chat)
+    monkeypatch.setattr(
+        ml_client.NewsTags,
+        "model_json_schema",
+        classmethod(lambda cls: pytest.fail("schema regenerated")),
+    )
+
+    client._chat("tags", "prompt", ml_client.NewsTags)
+    client._chat("tags", "prompt", ml_client.NewsTags)
+
+    assert formats[0] is formats[1] is ml_client.JSON_SCHEMAS[ml_client.NewsTags]
+    assert formats[0]["required"] == ["tags"]
+
+
+def test_chat_repairs_invalid_json(client, monkeypatch):
+    """Test that invalid model output is sent back to the model for repair"""
+    import src.ml_client as ml_client
+
+    seen_messages = []
+    responses = [fake_response('{"tag": "AI"}'), fake_response('{"tags": ["AI"]}')]
+
+    def fake_chat(messages, **kwargs):
+        seen_messages.append(messages)
+        return responses.pop(0)
+
+    monkeypatch.setattr(client._ollama, "chat", fake_chat)
+
+    assert client._chat("tags", "prompt", ml_client.NewsTags).tags == ["AI"]
+    assert len(seen_messages[1]) == 3
+    assert seen_messages[1][1] == {"role": "assistant", "content": '{"tag": "AI"}'}
+
+
+def test_chat_rejects_calls_when_circuit_open(client, monkeypatch):
+    """Test that an open circuit short-circuits LLM calls"""
+    import src.ml_client as ml_client
+    from src.breaker import CircuitOpenError
+
+    monkeypatch.setattr(ml_client.time, "sleep", lambda delay: None)
+
+    def failing_chat(**kwargs):
+        raise ConnectionError("server down")
+
+    monkeypatch.setattr(client._ollama, "chat", failing_chat)
+
+    for _ in range(ml_client.BREAKER_FAILURE_THRESHOLD):
+        try:
+            client._chat("tags", "prompt", ml_client.NewsTags)
+        except (ConnectionError, CircuitOpenError):
+            pass
+
+    assert client.breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        client._chat("tags", "prompt", ml_client.NewsTags)
+
+
+def test_chat_does_not_retry_client_errors(client, monkeypatch):
+    """Test that 4xx errors fail at once without counting against the breaker"""
+    from ollama import ResponseError
+
+    import src.ml_client as ml_client
+
+    calls = []
+
+    def missing_model(**kwargs):
+        calls.append(kwargs)
+        raise ResponseError("model not found", status_code=404)
+
+    monkeypatch.setattr(client._ollama, "chat", missing_model)
+
+    for _ in range(ml_client.BREAKER_FAILURE_THRESHOLD + 1):
+        with pytest.raises(ResponseError):
+            client._chat("tags", "prompt", ml_client.NewsTags)
+
+    assert len(calls) == ml_client.BREAKER_FAILURE_THRESHOLD + 1
+    assert client.breaker.state == "closed"
+
+
+def test_is_transient():
+    import httpx
+    from ollama import ResponseError
+
+    from src.ml_client import is_transient
+
+    assert is_transient(ResponseError("overloaded", status_code=503))
+    assert not is_transient(ResponseError("bad request", status_code=400))
+    assert is_transient(httpx.ReadTimeout("timed out"))
+    assert is_transient(ConnectionError("refused"))
+    assert not is_transient(ValueError("bug"))
+
+
+@pytest.mark.asyncio
+async def test_run_in_daemon_thread():
+    import threading
+
+    from src.ml_client import run_in_daemon_thread
+
+    assert await run_in_daemon_thread(lambda x: x * 2, 21) == 42
+    with pytest.raises(ValueError):
+        await run_in_daemon_thread(int, "not a number")
+
+    release = threading.Event()
+    threads = []
+
+    def blocking_call():
+        threads.append(threading.current_thread())
+        release.wait()
+
+    future = run_in_daemon_thread(blocking_call)
+    await asyncio.sleep(0.01)
+    future.cancel()
+    # The abandoned call does not hold up the process at exit
+    assert threads[0].daemon
+    release.set()
@@ -0,0 +1,68 @@
+import asyncio
+import logging
+import time
+from wsgiref.util import setup_testing_defaults
+
+import pytest
+
+from src.monitor import LoopMonitor, make_monitoring_app
+
+
+def blocking_call(seconds):
+    time.sleep(seconds)
+
+
+def call_app(app, path, query=""):
+    environ = {"PATH_INFO": path, "QUERY_STRING": query}
+    setup_testing_defaults(environ)
+    status = {}
+
+    def start_response(code, headers):
+        status["code"] = code
+
+    body = b"".join(app(environ, start_response))
+    return status["code"], body.decode("utf-8")
+
+
+@pytest.mark.asyncio
+async def test_reports_blocked_loop(caplog):
+    monitor = LoopMonitor(interval=0.01, stall_threshold=0.1)
+    monitor.start()
+    await asyncio.sleep(0.05)
+
+    with caplog.at_level(logging.WARNING, logger="Monitor"):
+        blocking_call(0.4)
+        await asyncio.sleep(0.05)
+    monitor.stop()
+
+    stalls = [r for r in caplog.records if "Event loop blocked" in r.getMessage()]
+    assert len(stalls) == 1
+    assert "blocking_call" in stalls[0].stack
+
+
+@pytest.mark.asyncio
+async def test_profile_endpoint_samples_loop_thread():
+    monitor = LoopMonitor(interval=0.01)
+    monitor.start()
+    app = make_monitoring_app(monitor)
+
+    task = asyncio.get_running_loop().run_in_executor(
+        None, call_app, app, "/debug/profile", "seconds=0.1"
+    )
+    blocking_call(0.3)
+    code, body = await task
+    monitor.stop()
+
+    assert code.startswith("200")
+    assert "blocking_call" in body
+
+
+def test_metrics_and_errors():
+    app = make_monitoring_app(LoopMonitor())
+
+    code, body = call_app(app, "/metrics")
+    assert code.startswith("200")
+    assert "event_loop_lag_seconds" in body
+
+    assert call_app(app, "/debug/profile")[0].startswith("503")
+    assert call_app(make_monitoring_app(None), "/debug/profile")[0].startswith("503")
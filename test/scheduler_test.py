@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+from src.scheduler import FairScheduler
+
+
+async def drain(scheduler, count):
+    return [(await scheduler.get()).source for _ in range(count)]
+
+
+@pytest.mark.asyncio
+async def test_burst_does_not_starve_other_sources():
+    scheduler = FairScheduler()
+    for i in range(5):
+        scheduler.put(f"burst {i}", "loud")
+    scheduler.put("urgent", "quiet")
+
+    order = await drain(scheduler, 6)
+
+    assert order.index("quiet") <= 1
+
+
+@pytest.mark.asyncio
+async def test_weights_share_throughput():
+    scheduler = FairScheduler(weights={"heavy": 2.0})
+    for i in range(6):
+        scheduler.put(f"a{i}", "heavy")
+        scheduler.put(f"b{i}", "light")
+
+    order = await drain(scheduler, 6)
+
+    assert order.count("heavy") == 4
+    assert order.count("light") == 2
+
+
+@pytest.mark.asyncio
+async def test_priority_goes_first():
+    scheduler = FairScheduler(priorities={"breaking": 10})
+    scheduler.put("regular", "regular")
+    scheduler.put("breaking", "breaking")
+
+    assert await drain(scheduler, 2) == ["breaking", "regular"]
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_delays_source():
+    scheduler = FairScheduler(rate_limits={"limited": 60 * 20})  # one per 50ms
+    scheduler.put("first", "limited")
+    scheduler.put("second", "limited")
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    await drain(scheduler, 2)
+
+    assert loop.time() - started >= 0.04
+
+
+@pytest.mark.asyncio
+async def test_stale_items_are_shed():
+    scheduler = FairScheduler(max_age=0.01)
+    scheduler.put("old", "chat")
+    await asyncio.sleep(0.02)
+    scheduler.put("new", "chat")
+
+    item = await scheduler.get()
+
+    assert item.text == "new"
+    assert len(scheduler) == 0
+
+
+@pytest.mark.asyncio
+async def test_get_waits_for_put():
+    scheduler = FairScheduler()
+
+    getter = asyncio.create_task(scheduler.get())
+    await asyncio.sleep(0.01)
+    assert not getter.done()
+
+    scheduler.put("late", "chat")
+    item = await asyncio.wait_for(getter, 1)
+
+    assert item.text == "late"
@@ -36,10 +36,15 @@ class DummyClient:
             yield msg
 
     async def get_dialogs(self):
+        self.dialogs_loaded = True
         if False:
             yield
         return
 
+    async def resolve_peer(self, chat: Any):
+        if chat not in self._history_map:
+            raise KeyError(f"ID not found: {chat}")
+
 
 class DummyCore:
     def __init__(self):
@@ -117,3 +122,146 @@ async def test_watch_processes_only_new(monkeypatch):
 
     with pytest.raises(asyncio.CancelledError):
         await asyncio.gather(loop_task, cancel_task)
+
+
+class AsyncDummyCore(DummyCore):
+    async def receive_news(self, text: str, source: str):
+        self.received.append((source, text))
+
+
+def make_album_message(msg_id, chat, media_group_id, caption=None, seconds=0):
+    from datetime import datetime, timedelta
+
+    msg = DummyMessage(msg_id, chat, text=None)
+    msg.caption = caption
+    msg.media_group_id = media_group_id
+    msg.date = datetime(2025, 5, 3, 12, 0) + timedelta(seconds=seconds)
+    return msg
+
+
+def test_coalesce_messages_groups_albums_and_split_posts():
+    from src.scraper import coalesce_messages
+
+    chat = DummyChat(-1, title="Chat")
+    album = [
+        make_album_message(1, chat, "album", caption="Caption"),
+        make_album_message(2, chat, "album", seconds=1),
+    ]
+    later = make_album_message(3, chat, None, caption="Later", seconds=60)
+    split = make_album_message(4, chat, None, caption="Split", seconds=61)
+
+    groups = coalesce_messages(album + [later, split], window=2)
+
+    assert [[msg.id for msg in group] for group in groups] == [[1, 2], [3, 4]]
+
+
+@pytest.mark.asyncio
+async def test_process_messages_joins_and_deduplicates():
+    import src.scraper as scraper
+
+    chat = DummyChat(-1, title="Chat")
+    core = AsyncDummyCore()
+    watcher = scraper.Scraper(chats=[-1], api_id=123, api_hash="hash", core=core)
+
+    album = [
+        make_album_message(1, chat, "album", caption="Caption"),
+        make_album_message(2, chat, "album", caption="Caption"),
+        make_album_message(3, chat, "album", caption="More"),
+    ]
+    await watcher._process_messages(album)
+    await watcher._process_messages(
+        [make_album_message(4, chat, None, "Caption\n\nMore")]
+    )
+
+    assert core.received == [("Chat", "Caption\n\nMore")]
+
+
+@pytest.mark.asyncio
+async def test_process_messages_retries_failed_submit():
+    import src.scraper as scraper
+
+    class FlakyCore(AsyncDummyCore):
+        failures = 1
+
+        async def receive_news(self, text: str, source: str):
+            if self.failures:
+                self.failures -= 1
+                raise RuntimeError("core unavailable")
+            await super().receive_news(text, source)
+
+    chat = DummyChat(-1, title="Chat")
+    core = FlakyCore()
+    watcher = scraper.Scraper(chats=[-1], api_id=123, api_hash="hash", core=core)
+    group = [make_album_message(1, chat, None, caption="Breaking")]
+
+    with pytest.raises(RuntimeError):
+        await watcher._process_messages(group)
+    await watcher._process_messages(group)
+
+    assert core.received == [("Chat", "Breaking")]
+
+
+@pytest.mark.asyncio
+async def test_watch_holds_fresh_album_until_complete():
+    from datetime import datetime
+
+    import src.scraper as scraper
+
+    chat = DummyChat(-5, title="Chat")
+    first_part = make_album_message(1, chat, "album", caption="Caption")
+    first_part.date = datetime.now()
+    history = {-5: [first_part]}
+
+    core = AsyncDummyCore()
+    watcher = scraper.Scraper(
+        chats=[-5], api_id=123, api_hash="hash", fetch_interval=0.01, core=core
+    )
+    watcher._client = DummyClient(history)
+    watcher._last_ids = {-5: 0}
+    watcher._prime_last_ids = lambda: asyncio.sleep(0)
+
+    loop_task = asyncio.create_task(watcher._watch_loop())
+    await asyncio.sleep(0.05)
+    assert core.received == []
+
+    second_part = make_album_message(2, chat, "album", caption="Second")
+    second_part.date = datetime.now()
+    first_part.date = datetime.now()
+    watcher.coalesce_window = 0.05
+    history[-5] = [second_part, first_part]
+    await asyncio.sleep(0.2)
+    loop_task.cancel()
+
+    assert core.received == [("Chat", "Caption\n\nSecond")]
+    assert watcher._last_ids[-5] == 2
+
+
+@pytest.mark.asyncio
+async def test_resolve_chats_loads_dialogs_only_for_unknown_peers():
+    import src.scraper as scraper
+
+    watcher = scraper.Scraper(chats=[-1], api_id=123, api_hash="hash")
+    watcher._client = DummyClient({-1: []})
+    await watcher._resolve_chats()
+    assert not hasattr(watcher._client, "dialogs_loaded")
+
+    watcher.chats = [-1, -2]
+    await watcher._resolve_chats()
+    assert watcher._client.dialogs_loaded
+
+
+def test_coalesce_window_starts_at_first_message():
+    from src.scraper import coalesce_messages
+
+    chat = DummyChat(-1, title="Channel")
+    # Separate posts one second apart must not chain into one item
+    posts = [
+        make_album_message(i, chat, None, caption=f"Post {i}", seconds=i)
+        for i in range(6)
+    ]
+
+    groups = coalesce_messages(posts, window=2)
+    assert [[msg.id for msg in group] for group in groups] == [[0, 1, 2], [3, 4, 5]]
+
+    groups = coalesce_messages(posts, window=10, max_messages=4)
+    assert [[msg.id for msg in group] for group in groups] == [[0, 1, 2, 3], [4, 5]]
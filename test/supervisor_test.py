@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+
+from src.supervisor import SupervisorClosedError, TaskSupervisor
+
+
+@pytest.mark.asyncio
+async def test_tracks_tasks_and_limits_concurrency():
+    supervisor = TaskSupervisor("test-limit", max_concurrency=2)
+    running = []
+    peak = []
+
+    async def job():
+        running.append(1)
+        peak.append(len(running))
+        await asyncio.sleep(0.01)
+        running.pop()
+
+    for _ in range(5):
+        supervisor.spawn(job())
+    assert len(supervisor) == 5
+
+    assert await supervisor.wait(1) == 0
+    assert max(peak) == 2
+
+
+@pytest.mark.asyncio
+async def test_failed_task_is_logged_and_forgotten(caplog):
+    supervisor = TaskSupervisor("test-fail")
+
+    async def failing():
+        raise RuntimeError("boom")
+
+    supervisor.spawn(failing(), name="failing")
+    await supervisor.wait(1)
+
+    assert len(supervisor) == 0
+    assert "failing" in caplog.text and "boom" in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_close_and_cancel_all():
+    supervisor = TaskSupervisor("test-cancel")
+    task = supervisor.spawn(asyncio.sleep(10))
+
+    supervisor.close()
+    with pytest.raises(SupervisorClosedError):
+        supervisor.spawn(asyncio.sleep(0))
+
+    assert await supervisor.wait(0.01) == 1
+    await supervisor.cancel_all()
+    assert task.cancelled()
+    assert len(supervisor) == 0
@@ -0,0 +1,98 @@
+import time
+
+from src.tags import TagCanonicalizer, normalize_tag
+
+
+class DummyStore:
+    def __init__(self, aliases=None):
+        self.aliases = dict(aliases or {})
+
+    def get_tag_aliases(self):
+        return dict(self.aliases)
+
+    def get_tag_alias(self, alias):
+        return self.aliases.get(alias)
+
+    def store_tag_alias(self, alias, canonical, replace=False):
+        if replace or alias not in self.aliases:
+            self.aliases[alias] = canonical
+        return self.aliases[alias]
+
+
+def test_normalize_tag():
+    assert normalize_tag("  The  U.S. ") == "us"
+    assert normalize_tag("ＵＳＡ") == "usa"
+    assert normalize_tag('"OpenAI"') == "openai"
+    assert normalize_tag("...") == ""
+
+
+def test_first_spelling_becomes_canonical():
+    store = DummyStore()
+    tags = TagCanonicalizer(store)
+
+    assert tags.canonicalize_all(["OpenAI", "openai", "OPENAI.", "AI"]) == [
+        "OpenAI",
+        "AI",
+    ]
+    assert store.aliases == {"openai": "OpenAI", "ai": "AI"}
+
+
+def test_default_canonical_forms_win_over_first_spelling():
+    store = DummyStore()
+    tags = TagCanonicalizer(store)
+
+    assert tags.canonicalize_all(["united states", "USA"]) == ["United States"]
+    assert tags.canonicalize_all(["european union", "EU"]) == ["European Union"]
+    assert store.aliases == {}
+
+
+def test_default_and_stored_aliases():
+    tags = TagCanonicalizer(DummyStore({"america": "United States"}))
+
+    assert tags.canonicalize_all(["USA", "United States", "America", "usa"]) == [
+        "United States"
+    ]
+
+
+def test_alias_registered_elsewhere_wins():
+    store = DummyStore()
+    tags = TagCanonicalizer(store)
+    tags.canonicalize("tag")
+    store.aliases["musk"] = "Elon Musk"
+
+    assert tags.canonicalize("Musk") == "Elon Musk"
+
+
+def test_add_alias():
+    store = DummyStore()
+    tags = TagCanonicalizer(store)
+    tags.canonicalize("Kyiv")
+
+    tags.add_alias("Kiev", "Kyiv")
+
+    assert tags.canonicalize("kiev") == "Kyiv"
+    assert store.aliases["kiev"] == "Kyiv"
+
+
+def test_lookup_sees_aliases_registered_later():
+    store = DummyStore()
+    reader = TagCanonicalizer(store)
+    assert reader.lookup("openai") == "openai"
+
+    TagCanonicalizer(store).canonicalize("OpenAI")
+
+    assert reader.lookup("openai") == "OpenAI"
+
+
+def test_aliases_reload_after_ttl(monkeypatch):
+    store = DummyStore()
+    tags = TagCanonicalizer(store, ttl=60)
+    assert tags.canonicalize("Kiev") == "Kiev"
+
+    # Another process remaps the alias, as manage.py alias does
+    store.aliases["kiev"] = "Kyiv"
+    assert tags.canonicalize("Kiev") == "Kiev"
+
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 61)
+    assert tags.canonicalize("Kiev") == "Kyiv"
@@ -0,0 +1,75 @@
+import asyncio
+import builtins
+import json
+import logging
+
+from src.utils import (JsonFormatter, PayloadFilter, TextFormatter, run_async,
+                       summarize)
+
+
+def make_record(level=logging.INFO, **extra):
+    record = logging.makeLogRecord(
+        {"name": "Test", "levelno": level, "levelname": logging.getLevelName(level)}
+    )
+    record.msg = "Received update"
+    record.__dict__.update(extra)
+    return record
+
+
+def test_payload_filter_truncates():
+    record = make_record(payload="x" * 50, news_id=1)
+
+    assert PayloadFilter(max_chars=10, sample_rate=1.0).filter(record)
+    assert record.payload == "x" * 10 + "… [50 chars]"
+    assert record.news_id == 1
+
+
+def test_payload_filter_samples_only_payload_fields():
+    payload_filter = PayloadFilter(max_chars=10, sample_rate=0.0)
+
+    record = make_record(news_id=1, payload="text", comment="why")
+    assert payload_filter.filter(record)
+    assert record.news_id == 1
+    assert not hasattr(record, "payload") and not hasattr(record, "comment")
+    assert "Received update news_id=1" in TextFormatter("%(message)s").format(record)
+
+    warning = make_record(level=logging.WARNING, payload="text")
+    assert payload_filter.filter(warning)
+    assert warning.payload == "text"
+
+
+def test_json_formatter_includes_extra_fields():
+    line = JsonFormatter().format(make_record(news_id=7, payload="text"))
+    entry = json.loads(line)
+
+    assert entry["message"] == "Received update"
+    assert entry["news_id"] == 7
+    assert entry["payload"] == "text"
+
+
+def test_text_formatter_appends_payload_last():
+    line = TextFormatter("%(message)s").format(make_record(news_id=7, payload="text"))
+
+    assert line == "Received update news_id=7 | payload: text"
+
+
+def test_summarize():
+    assert summarize("short  text", 100) == "short text"
+    assert summarize("First sentence. Second sentence.", 25) == "First sentence."
+    assert summarize("one two three four five", 12) == "one two…"
+
+
+def test_run_async_falls_back_without_uvloop(monkeypatch):
+    real_import = builtins.__import__
+
+    def no_uvloop(name, *args, **kwargs):
+        if name == "uvloop":
+            raise ImportError(name)
+        return real_import(name, *args, **kwargs)
+
+    monkeypatch.setattr(builtins, "__import__", no_uvloop)
+
+    async def main():
+        return type(asyncio.get_running_loop()).__module__
+
+    assert run_async(main()).startswith("asyncio")